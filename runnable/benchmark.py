@@ -0,0 +1,438 @@
+#!/usr/bin/env python3
+
+# Copyright (c) 2023 Patineboot. All rights reserved.
+# Benchmark is licensed under CC BY-NC-ND 4.0.
+
+# Attribution-NonCommercial-NoDerivatives 4.0 International
+
+# Under the following terms:
+# Attribution — You must give appropriate credit, provide a
+# link to the license, and indicate if changes were made. You
+# may do so in any reasonable manner, but not in any way that
+# suggests the licensor endorses you or your use.
+# NonCommercial — You may not use the material for
+# commercial purposes.
+# NoDerivatives — If you remix, transform, or build upon the
+# material, you may not distribute the modified material.
+# No additional restrictions — You may not apply legal terms
+# or technological measures that legally restrict others from
+# doing anything the license permits.
+
+# Notices:
+# You do not have to comply with the license for elements of
+# the material in the public domain or where your use is
+# permitted by an applicable exception or limitation.
+
+# No warranties are given. The license may not give you all of
+# the permissions necessary for your intended use. For
+# example, other rights such as publicity, privacy, or moral
+# rights may limit how you use the material.
+
+import os
+import sys
+import json
+import random
+import logging
+import argparse
+import tempfile
+import subprocess
+from time import perf_counter
+from time import sleep
+from threading import Thread
+from threading import Event
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+######################
+#      Configure     #
+######################
+# the directory which contains benchmark.py.
+SCRIPT_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+# the rules file of the infrared home devices to make the synthetic traffic.
+DEVICE_RULES_JSON = os.path.join(SCRIPT_DIRECTORY, "devices.json")
+
+# the synthetic traffic.
+BENCHMARK_SCENARIOS = ["slider", "mixed", "chatter"]
+# the number of the messages of a slider drag and the seconds between them.
+SLIDER_BURST = 10
+SLIDER_STEP = 0.02
+# the seconds between the slider drags.
+SLIDER_PAUSE = 0.5
+# the seconds between the sensor polls on the chatter scenario.
+CHATTER_SENSOR_INTERVAL = 0.05
+# the message to wait for the Custom-Command to start, both of the modes reply it with the id.
+WARMUP_MESSAGE = {"method": "STATS", "id": 0}
+# the seconds to wait for the Custom-Command to start.
+WARMUP_TIMEOUT = 30
+
+######################
+#    Script Code     #
+######################
+LOGGER = None
+
+
+class TrafficGenerator:
+    """TrafficGenerator class.
+
+    The TrafficGenerator class makes the synthetic '_SET_' messages of the devices in devices.json.
+    - Make the records ``{"at": seconds, "message": message}`` as TrafficCapture records.
+    - Keep the status of each device, so a message carries the status before the change.
+    """
+
+    def __init__(self, rules_path=DEVICE_RULES_JSON, seed=None):
+        """Create a traffic generator.
+        Args:
+            rules_path: The rules file of the infrared home devices.
+            seed: The seed of the random traffic.
+        """
+        super().__init__()
+
+        with open(rules_path) as file:
+            rules_json = json.load(file)
+
+        self.__random = random.Random(seed)
+        # the device name to the characteristic name to the candidate values.
+        self.__candidates = {}
+        # the device name to the characteristic changed with a slider.
+        self.__sliders = {}
+        for name, device in rules_json["devices"].items():
+            rules = rules_json["rules"][device["rules"]]
+            candidates = {}
+            for characteristic in rules["match"]:
+                candidates[characteristic] = sorted({code[characteristic] for code in rules["codes"]
+                                                     if characteristic in code})
+            if "range" in rules:
+                characteristic = rules["range"]
+                bounds = [code[characteristic] for code in rules["codes"] if characteristic in code]
+                candidates[characteristic] = list(range(min(bounds), max(bounds) + 1))
+                self.__sliders[name] = characteristic
+            self.__candidates[name] = candidates
+
+        self.__status = {name: {characteristic: self.__random.choice(values)
+                                for characteristic, values in candidates.items()}
+                         for name, candidates in self.__candidates.items()}
+
+    def slider(self, count):
+        """Make ``count`` messages dragging the sliders of the devices.
+        """
+        records = []
+        at = 0.0
+        while len(records) < count:
+            name = self.__random.choice(sorted(self.__sliders))
+            characteristic = self.__sliders[name]
+            values = self.__candidates[name][characteristic]
+            index = values.index(self.__status[name][characteristic])
+            step = self.__random.choice([-1, 1]) * max(1, len(values) // (SLIDER_BURST * 2))
+            for _ in range(min(SLIDER_BURST, count - len(records))):
+                index = min(max(index + step, 0), len(values) - 1)
+                records.append(self.__record(at, name, characteristic, values[index]))
+                at += SLIDER_STEP
+            at += SLIDER_PAUSE
+        return records
+
+    def mixed(self, count, rate):
+        """Make ``count`` messages changing the characteristics of the devices randomly ``rate`` times a second.
+        """
+        records = []
+        for index in range(count):
+            name = self.__random.choice(sorted(self.__candidates))
+            characteristic = self.__random.choice(sorted(self.__candidates[name]))
+            value = self.__random.choice(self.__candidates[name][characteristic])
+            records.append(self.__record(index / rate, name, characteristic, value))
+        return records
+
+    def __record(self, at, name, characteristic, value):
+        status = self.__status[name]
+        message = {
+            "method": "SET",
+            "name": name,
+            "characteristic": characteristic,
+            "value": value,
+            "status": dict(status),
+        }
+        status[characteristic] = value
+        return {"at": round(at, 6), "message": message}
+
+
+class Benchmark:
+    """Benchmark class.
+
+    The Benchmark class replays the records to a Custom-Command and measures it.
+    - Wait for the reply of a warm-up message, so the startup is not measured.
+    - Write the messages on the schedule of the records with a request id on each.
+    - Measure the latency from writing a message to reading the reply with the same id.
+    - Measure the peak memory of the Custom-Command after it exits.
+    """
+
+    def __init__(self, command, records, speed=1.0):
+        """Create a benchmark.
+        Args:
+            command: The command line of the Custom-Command.
+            records: The records of the messages to replay.
+            speed: The speed to replay the records, 0 writes the messages as fast as possible.
+        """
+        super().__init__()
+
+        self.__command = command
+        self.__records = records
+        self.__speed = speed
+        # the request id to the time of writing the message.
+        self.__written = {}
+        self.__latencies = []
+        self.__reports = 0
+        self.__finished = None
+        self.__ready = Event()
+
+    def run(self):
+        """Replay the records and wait for the Custom-Command to exit.
+        Returns:
+            The dictionary of the results.
+        """
+        process = subprocess.Popen(self.__command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, bufsize=0)
+        reader = Thread(target=self.__read, args=(process.stdout,))
+        reader.start()
+
+        process.stdin.write((json.dumps(WARMUP_MESSAGE) + "\n").encode())
+        if not self.__ready.wait(WARMUP_TIMEOUT):
+            process.kill()
+            raise RuntimeError(f"{self.__command[1]} did not reply the warm-up message")
+
+        started = perf_counter()
+        self.__write(process.stdin, started)
+        process.stdin.close()
+        reader.join()
+        process.wait()
+
+        return self.__result(started, process.returncode)
+
+    def __write(self, stream, started):
+        for request_id, record in enumerate(self.__records, 1):
+            if self.__speed > 0:
+                delay = started + record["at"] / self.__speed - perf_counter()
+                if delay > 0:
+                    sleep(delay)
+            message = dict(record["message"], id=request_id)
+            line = (json.dumps(message) + "\n").encode()
+            self.__written[request_id] = perf_counter()
+            stream.write(line)
+
+    def __read(self, stream):
+        for line in stream:
+            now = perf_counter()
+            try:
+                reply = json.loads(line)
+            except ValueError:
+                continue
+            if not isinstance(reply, dict):
+                continue
+            if not self.__ready.is_set() and reply.get("id") == WARMUP_MESSAGE["id"]:
+                self.__ready.set()
+                continue
+            written = self.__written.pop(reply.get("id"), None)
+            if written is None:
+                self.__reports += 1
+                continue
+            self.__latencies.append(now - written)
+            self.__finished = now
+
+    def __result(self, started, returncode):
+        latencies = sorted(self.__latencies)
+        elapsed = (self.__finished or perf_counter()) - started
+        peak_rss = None
+        if resource is not None:
+            peak_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+            # macOS measures the peak memory in bytes, Linux does in kilobytes.
+            peak_rss = peak_rss / (1024 * 1024) if sys.platform == "darwin" else peak_rss / 1024
+
+        return {
+            "messages": len(self.__records),
+            "replies": len(latencies),
+            "unanswered": len(self.__written),
+            "reports": self.__reports,
+            "elapsed": elapsed,
+            "messages_per_second": len(latencies) / elapsed if elapsed > 0 else 0.0,
+            "latency_p50": self.__percentile(latencies, 50),
+            "latency_p99": self.__percentile(latencies, 99),
+            "latency_max": latencies[-1] if latencies else None,
+            "peak_rss_mb": peak_rss,
+            "returncode": returncode,
+        }
+
+    def __percentile(self, latencies, percent):
+        if not latencies:
+            return None
+        # the nearest-rank percentile.
+        rank = max(1, -(-len(latencies) * percent // 100))
+        return latencies[int(rank) - 1]
+
+
+def load_records(path):
+    """Load the records of the JSONL file ``path`` recorded with ``--capture`` of runnable.py.
+    A line of a message without the record is replayed without delay.
+    """
+    records = []
+    with open(path) as file:
+        for line in file:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if "message" not in record:
+                record = {"at": records[-1]["at"] if records else 0.0, "message": record}
+            records.append(record)
+    return records
+
+
+def serve(options):
+    """Run InfraredRunnable on the standard input and output with the fake backends.
+    """
+    global LOGGER
+    logging.basicConfig(stream=sys.stderr, level=logging.WARNING)
+    LOGGER = logging.getLogger("benchmark")
+
+    from fakedevices import FakeTransmitter
+    from fakedevices import FakeBME280
+    from sensorpolicy import SensorPolicy
+    from infraredrunnable import InfraredRunnable
+
+    backends = {
+        "transmitter_factory": lambda logger, code_table, device: FakeTransmitter(logger, options.flash_latency),
+        "sensor_devices": {"bme280": FakeBME280(options.sensor_latency, noise=1.0 if options.sensor_interval else 0.0)},
+    }
+    if options.sensor_interval:
+        # report every reading to load the writer with the sensor chatter.
+        backends["policy"] = SensorPolicy(LOGGER, deadbands={}, min_interval=options.sensor_interval,
+                                          max_interval=options.sensor_interval)
+
+    runnable = InfraredRunnable(LOGGER, False, options.cache_ttl, options.asyncio, options.codec,
+                                backends=backends, rules_file=options.rules, deadline=options.deadline)
+    runnable.run()
+
+
+def spread_transmitters(count):
+    """Make the rules file spreading the devices of devices.json over ``count`` transmitters.
+    Returns:
+        The path of the temporary rules file.
+    """
+    with open(DEVICE_RULES_JSON) as file:
+        rules_json = json.load(file)
+
+    transmitters = [f"transmitter{index}" for index in range(count)]
+    rules_json["transmitters"] = {transmitter: None for transmitter in transmitters}
+    for index, device in enumerate(rules_json["devices"].values()):
+        device["transmitter"] = transmitters[index % count]
+
+    with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as file:
+        json.dump(rules_json, file)
+    return file.name
+
+
+def make_command(options):
+    if options.target == "echo":
+        return [sys.executable, os.path.join(SCRIPT_DIRECTORY, "runnable.py"), "--test", "--codec", options.codec]
+    if options.target == "fleet":
+        return [sys.executable, os.path.join(SCRIPT_DIRECTORY, "runnable.py"), "--test", "--codec", options.codec,
+                "--fleet", "0", "--fleet-latency", str(options.flash_latency)]
+
+    command = [sys.executable, os.path.abspath(__file__), "--serve",
+               "--codec", options.codec,
+               "--cache-ttl", str(options.cache_ttl),
+               "--deadline", str(options.deadline),
+               "--flash-latency", str(options.flash_latency),
+               "--sensor-latency", str(options.sensor_latency),
+               "--sensor-interval", str(options.sensor_interval),
+               "--rules", options.rules]
+    if options.asyncio:
+        command.append("--asyncio")
+    return command
+
+
+def make_records(options):
+    if options.trace is not None:
+        return load_records(options.trace)
+
+    generator = TrafficGenerator(seed=options.seed)
+    if options.scenario == "slider":
+        return generator.slider(options.count)
+    return generator.mixed(options.count, options.rate)
+
+
+def print_result(result):
+    for key, value in result.items():
+        if isinstance(value, float):
+            value = f"{value:.6f}"
+        print(f"{key}: {value}")
+
+
+def parse_options():
+    parser = argparse.ArgumentParser(
+        description="Benchmark replays the messages to InfraredRunnable with the fake infrared HAT."
+    )
+    parser.add_argument("--target", default="infrared", choices=["infrared", "echo", "fleet"],
+                        help="benchmark InfraredRunnable, the test mode of Runnable, or its simulated fleet.")
+    parser.add_argument("--trace", default=None,
+                        help="replay the JSONL file recorded with '--capture' of runnable.py instead of a scenario.")
+    parser.add_argument("--scenario", default="mixed", choices=BENCHMARK_SCENARIOS,
+                        help="make the synthetic messages of the scenario.")
+    parser.add_argument("--count", type=int, default=1000, help="the number of the synthetic messages.")
+    parser.add_argument("--rate", type=float, default=100, help="the synthetic messages a second on the mixed scenarios.")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="replay faster by the factor, 0 writes the messages as fast as possible.")
+    parser.add_argument("--seed", type=int, default=0, help="the seed of the synthetic messages.")
+    parser.add_argument("--write-trace", dest='write_trace', default=None,
+                        help="write the records to the JSONL file to replay them with '--trace' later.")
+    parser.add_argument("--flash-latency", dest='flash_latency', type=float, default=0.1,
+                        help="the seconds the fake transmitter takes to send an infrared code.")
+    parser.add_argument("--sensor-latency", dest='sensor_latency', type=float, default=0.01,
+                        help="the seconds the fake sensor takes to measure.")
+    parser.add_argument("--sensor-interval", dest='sensor_interval', type=float, default=None,
+                        help="poll the fake sensor every the seconds and report every reading.")
+    parser.add_argument("-a", "--asyncio", action="store_true", help="run InfraredRunnable on the asyncio mode.")
+    parser.add_argument("-j", "--codec", default="auto", choices=["auto", "orjson", "ujson", "json"],
+                        help="the JSON codec of the Custom-Command.")
+    parser.add_argument("-c", "--cache-ttl", dest='cache_ttl', type=float, default=300,
+                        help="the seconds of the transmit cache of InfraredRunnable.")
+    parser.add_argument("-d", "--deadline", type=float, default=10,
+                        help="the seconds InfraredRunnable drops a command waiting for the transmitter, 0 never drops it.")
+    parser.add_argument("--transmitters", type=int, default=None,
+                        help="spread the devices over the fake transmitters, the transmitters of devices.json if None.")
+    parser.add_argument("--json", action="store_true", help="print the results in JSON.")
+    parser.add_argument("--rules", default=DEVICE_RULES_JSON, help=argparse.SUPPRESS)
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    options = parse_options()
+
+    if options.serve:
+        serve(options)
+        sys.exit(0)
+
+    if options.scenario == "chatter" and options.sensor_interval is None:
+        options.sensor_interval = CHATTER_SENSOR_INTERVAL
+    if options.sensor_interval is None:
+        options.sensor_interval = 0
+
+    if options.transmitters is not None:
+        options.rules = spread_transmitters(options.transmitters)
+
+    records = make_records(options)
+    if options.write_trace is not None:
+        with open(options.write_trace, "w") as file:
+            for record in records:
+                file.write(json.dumps(record) + "\n")
+
+    try:
+        result = Benchmark(make_command(options), records, options.speed).run()
+    finally:
+        if options.transmitters is not None:
+            os.remove(options.rules)
+    result = dict(target=options.target, trace=options.trace or options.scenario, **result)
+    if options.json:
+        print(json.dumps(result))
+    else:
+        print_result(result)
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+
+# Copyright (c) 2023 Patineboot. All rights reserved.
+# CircuitBreaker is licensed under CC BY-NC-ND 4.0.
+
+# Attribution-NonCommercial-NoDerivatives 4.0 International
+
+# Under the following terms:
+# Attribution — You must give appropriate credit, provide a
+# link to the license, and indicate if changes were made. You
+# may do so in any reasonable manner, but not in any way that
+# suggests the licensor endorses you or your use.
+# NonCommercial — You may not use the material for
+# commercial purposes.
+# NoDerivatives — If you remix, transform, or build upon the
+# material, you may not distribute the modified material.
+# No additional restrictions — You may not apply legal terms
+# or technological measures that legally restrict others from
+# doing anything the license permits.
+
+# Notices:
+# You do not have to comply with the license for elements of
+# the material in the public domain or where your use is
+# permitted by an applicable exception or limitation.
+
+# No warranties are given. The license may not give you all of
+# the permissions necessary for your intended use. For
+# example, other rights such as publicity, privacy, or moral
+# rights may limit how you use the material.
+
+from time import monotonic
+from threading import Lock
+
+from multilogger import traced
+
+######################
+#      Configure     #
+######################
+# the number of the consecutive failures to open the circuit.
+CIRCUIT_THRESHOLD = 3
+# the seconds to fail the calls fast before letting a trial call through.
+CIRCUIT_RESET_TIMEOUT = 30
+
+######################
+#    Script Code     #
+######################
+LOGGER = None
+
+
+class CircuitOpenError(RuntimeError):
+    """The circuit is open, the call failed fast without touching the hardware.
+    """
+
+
+class CircuitBreaker:
+    """CircuitBreaker class.
+
+    The CircuitBreaker class fails the calls fast while the hardware behind it is unhealthy.
+    - Open the circuit after ``threshold`` consecutive failures, and fail the calls without calling.
+    - Let one trial call through after ``reset_timeout`` seconds, close the circuit if it succeeds.
+    """
+
+    @traced
+    def __init__(self, logger, name, threshold=CIRCUIT_THRESHOLD, reset_timeout=CIRCUIT_RESET_TIMEOUT):
+        """Create a closed circuit breaker.
+        Args:
+            logger: The logger.
+            name: The name of the hardware behind the circuit breaker.
+            threshold: The number of the consecutive failures to open the circuit.
+            reset_timeout: The seconds to fail the calls fast before letting a trial call through.
+        """
+        super().__init__()
+        global LOGGER
+        LOGGER = logger
+
+        self.__name = name
+        self.__threshold = threshold
+        self.__reset_timeout = reset_timeout
+        self.__lock = Lock()
+        self.__failures = 0
+        # the time of opening the circuit, None while the circuit is closed.
+        self.__opened = None
+        self.__trial = False
+
+    def check(self):
+        """Check a call may go through.
+        Raises:
+            CircuitOpenError: The circuit is open and the call fails fast.
+        """
+        with self.__lock:
+            if self.__opened is None:
+                return
+            if self.__trial or monotonic() - self.__opened < self.__reset_timeout:
+                raise CircuitOpenError(f"{self.__name} is unhealthy after {self.__failures} failures")
+            # half open, the trial call decides to close the circuit.
+            self.__trial = True
+
+    def succeed(self):
+        """Record a successful call, and close the circuit.
+        """
+        with self.__lock:
+            if self.__opened is not None:
+                LOGGER.warning(f"Circuit: closed {self.__name}")
+            self.__failures = 0
+            self.__opened = None
+            self.__trial = False
+
+    def fail(self):
+        """Record a failed call, and open the circuit after the consecutive failures.
+        """
+        with self.__lock:
+            self.__failures += 1
+            self.__trial = False
+            if self.__opened is None and self.__failures < self.__threshold:
+                return
+            if self.__opened is None:
+                LOGGER.warning(f"Circuit: opened {self.__name} after {self.__failures} failures")
+            self.__opened = monotonic()
+
+    def is_open(self):
+        with self.__lock:
+            return self.__opened is not None
+
+
+if __name__ == "__main__":
+    print("CircuitBreaker is an Import Module.")
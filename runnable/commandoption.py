@@ -30,6 +30,8 @@
 
 import argparse
 
+from multilogger import traced
+
 LOGGER = None
 
 
@@ -44,27 +46,144 @@ class CommandOption:
             description="Infrared Remote is a firmware to send an infrared code on Raspberry Pi with an infrared HAT."
         )
         parser.add_argument("-t", "--test", action="store_true", help="Run on the test mode for Runnable Platform.")
+        parser.add_argument("--fleet", type=int, default=None,
+                            help="run the simulated fleet with the number of the virtual sensors on the test mode.")
+        parser.add_argument("--fleet-latency", dest='fleet_latency', type=float, default=0.1,
+                            help="the seconds a virtual device takes to answer a SET message on average.")
+        parser.add_argument("--fleet-interval", dest='fleet_interval', type=float, default=10,
+                            help="the seconds between the reports of a virtual sensor.")
+        parser.add_argument("--fleet-ramp", dest='fleet_ramp', type=float, default=0,
+                            help="double the rate of the reports every the seconds until it saturates, 0 never ramps.")
         parser.add_argument("-v", "--verbose", action="store_true", help="run with verbose mode.")
         parser.add_argument("-n", "--dry-run", dest='dry_run', action="store_true", help="run with no changes mode.")
+        parser.add_argument("-a", "--asyncio", action="store_true",
+                            help="run the stages as tasks on an asyncio event loop instead of threads.")
+        parser.add_argument("-j", "--codec", default="auto", choices=["auto", "orjson", "ujson", "json"],
+                            help="encode and decode the messages with the JSON library, the fastest one installed on 'auto'.")
+        parser.add_argument("-c", "--cache-ttl", dest='cache_ttl', type=float, default=300,
+                            help="skip sending the same infrared code to a device again within the seconds, 0 sends every time.")
+        parser.add_argument("-d", "--deadline", type=float, default=10,
+                            help="drop a command waiting for the transmitter over the seconds, 0 never drops it.")
+        parser.add_argument("-m", "--metrics-file", dest='metrics_file', default=None,
+                            help="rewrite the metrics in the Prometheus text format to the file periodically.")
+        parser.add_argument("--metrics-interval", dest='metrics_interval', type=float, default=15,
+                            help="rewrite the metrics file every the seconds.")
+        parser.add_argument("--daemon", default=None,
+                            help="run as a daemon serving the clients connected to the Unix domain socket file.")
+        parser.add_argument("--connect", default=None,
+                            help="connect the standard input and output to the daemon of the Unix domain socket file.")
+        parser.add_argument("--startup-profile", dest='startup_profile', action="store_true",
+                            help="print the time of the startup phases to the standard error.")
+        parser.add_argument("-s", "--state-file", dest='state_file', default=None,
+                            help="keep the last state in the snapshot file to restart warm, the default file if omitted.")
+        parser.add_argument("--history-file", dest='history_file', default=None,
+                            help="record the sensor readings in the time series file, the default file if omitted.")
+        parser.add_argument("--capture", dest='capture_file', default=None,
+                            help="record the received messages to the JSONL file to replay with benchmark.py.")
+        parser.add_argument("--profile", nargs="?", const="", default=None,
+                            help="sample the stacks of all the threads and dump them to the files of the prefix, "
+                            "the default prefix if omitted. SIGUSR1 dumps them, SIGUSR2 switches the sampling.")
 
         self.__options = parser.parse_args()
 
+    @traced
     def get_test(self):
-        LOGGER.debug(f"STR")
         test = self.__options.test
-        LOGGER.debug(f"END {test}")
         return test
 
+    @traced
+    def get_fleet(self):
+        fleet = self.__options.fleet
+        return fleet
+
+    @traced
+    def get_fleet_latency(self):
+        fleet_latency = self.__options.fleet_latency
+        return fleet_latency
+
+    @traced
+    def get_fleet_interval(self):
+        fleet_interval = self.__options.fleet_interval
+        return fleet_interval
+
+    @traced
+    def get_fleet_ramp(self):
+        fleet_ramp = self.__options.fleet_ramp
+        return fleet_ramp
+
+    @traced
     def get_dryrun(self):
-        LOGGER.debug(f"STR")
         dryrun = self.__options.dry_run
-        LOGGER.debug(f"END {dryrun}")
         return dryrun
 
+    @traced
+    def get_asyncio(self):
+        use_asyncio = self.__options.asyncio
+        return use_asyncio
+
+    @traced
+    def get_codec(self):
+        codec = self.__options.codec
+        return codec
+
+    @traced
+    def get_cache_ttl(self):
+        cache_ttl = self.__options.cache_ttl
+        return cache_ttl
+
+    @traced
+    def get_deadline(self):
+        deadline = self.__options.deadline
+        return deadline
+
+    @traced
+    def get_metrics_file(self):
+        metrics_file = self.__options.metrics_file
+        return metrics_file
+
+    @traced
+    def get_metrics_interval(self):
+        metrics_interval = self.__options.metrics_interval
+        return metrics_interval
+
+    @traced
+    def get_capture_file(self):
+        capture_file = self.__options.capture_file
+        return capture_file
+
+    @traced
+    def get_daemon(self):
+        daemon = self.__options.daemon
+        return daemon
+
+    @traced
+    def get_connect(self):
+        connect = self.__options.connect
+        return connect
+
+    @traced
+    def get_startup_profile(self):
+        startup_profile = self.__options.startup_profile
+        return startup_profile
+
+    @traced
+    def get_state_file(self):
+        state_file = self.__options.state_file
+        return state_file
+
+    @traced
+    def get_profile(self):
+        profile = self.__options.profile
+        return profile
+
+    @traced
+    def get_history_file(self):
+        history_file = self.__options.history_file
+        return history_file
+
+    @traced
     def get_verbose(self):
-        LOGGER.debug(f"STR")
         verbose = self.__options.verbose
-        LOGGER.debug(f"END {verbose}")
         return verbose
 
 
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+
+# Copyright (c) 2023 Patineboot. All rights reserved.
+# DeviceMailbox is licensed under CC BY-NC-ND 4.0.
+
+# Attribution-NonCommercial-NoDerivatives 4.0 International
+
+# Under the following terms:
+# Attribution — You must give appropriate credit, provide a
+# link to the license, and indicate if changes were made. You
+# may do so in any reasonable manner, but not in any way that
+# suggests the licensor endorses you or your use.
+# NonCommercial — You may not use the material for
+# commercial purposes.
+# NoDerivatives — If you remix, transform, or build upon the
+# material, you may not distribute the modified material.
+# No additional restrictions — You may not apply legal terms
+# or technological measures that legally restrict others from
+# doing anything the license permits.
+
+# Notices:
+# You do not have to comply with the license for elements of
+# the material in the public domain or where your use is
+# permitted by an applicable exception or limitation.
+
+# No warranties are given. The license may not give you all of
+# the permissions necessary for your intended use. For
+# example, other rights such as publicity, privacy, or moral
+# rights may limit how you use the material.
+
+from threading import Condition
+
+from multilogger import traced
+
+######################
+#    Script Code     #
+######################
+LOGGER = None
+
+
+class DeviceMailbox:
+    """DeviceMailbox class.
+
+    The DeviceMailbox class holds the latest pending message of each device.
+    - A newer message for a device replaces the pending one, so only the final state is handled.
+    - A device is handed to one taker at a time until the taker calls ``done``.
+    - A message of a smaller priority is taken first, and the same priority in the arrival order of the devices.
+    - The pending messages of a group, the devices of a scene, are taken together with the first one of them.
+    """
+
+    @traced
+    def __init__(self, logger, coalesce=None, group=None, prioritize=None):
+        """Create a mailbox.
+        Args:
+            logger: The logger.
+            coalesce: The function to merge a pending message into a newer message,
+                ``coalesce(pending, message)`` returns the message to keep.
+                The newer message replaces the pending one if None.
+            group: The function to get the group of a message, ``group(message)`` returns None for no group.
+            prioritize: The function to get the priority of a merged message, ``prioritize(message)``.
+                The merged message keeps the priority of the newer message if None.
+        """
+        super().__init__()
+        global LOGGER
+        LOGGER = logger
+
+        self.__coalesce = coalesce
+        self.__group = group
+        self.__prioritize = prioritize
+        # the pending messages with the priority and the arrival order of the devices.
+        self.__pending = {}
+        self.__sequence = 0
+        self.__in_flight = set()
+        self.__closed = False
+        self.__condition = Condition()
+
+    def put(self, key, message, priority=0):
+        """Put ``message`` for the device ``key``, replacing the pending one.
+        Args:
+            key: The device.
+            message: The message.
+            priority: The priority of the message, the smaller is taken earlier.
+        Returns:
+            True if the message replaced a pending message.
+        """
+        with self.__condition:
+            pending = self.__pending.get(key)
+            if pending is None:
+                self.__sequence += 1
+                self.__pending[key] = (priority, self.__sequence, message)
+            else:
+                _, sequence, pending_message = pending
+                if self.__coalesce is not None:
+                    message = self.__coalesce(pending_message, message)
+                    # the merged message runs at the priority of the merged state, not of the newer change.
+                    if self.__prioritize is not None:
+                        priority = self.__prioritize(message)
+                # the device keeps the arrival order of the pending message.
+                self.__pending[key] = (priority, sequence, message)
+                LOGGER.info("coalesced a pending message of %s", key)
+            self.__condition.notify()
+        return pending is not None
+
+    def get(self):
+        """Take the first pending message of a device not in flight.
+        Block until such a message arrives or the mailbox is closed and drained.
+        Returns:
+            The tuple of the device key and the message, or of the tuple of the device keys
+            and the list of the messages of a group, None if closed and drained.
+        """
+        with self.__condition:
+            while True:
+                taken = self.get_nowait()
+                if taken is not None:
+                    return taken
+                if self.__closed and not self.__pending:
+                    return None
+                self.__condition.wait()
+
+    def get_nowait(self):
+        """Take the first pending message of a device not in flight without blocking.
+        Returns:
+            The tuple of the device key and the message, or of the tuple of the device keys
+            and the list of the messages of a group, None if no message is ready.
+        """
+        with self.__condition:
+            ready = [(priority, sequence, key) for key, (priority, sequence, _) in self.__pending.items()
+                     if key not in self.__in_flight]
+            if not ready:
+                return None
+            _, _, key = min(ready)
+            group = self.__group(self.__pending[key][2]) if self.__group is not None else None
+            if group is None:
+                self.__in_flight.add(key)
+                return key, self.__pending.pop(key)[2]
+
+            # take the pending messages of the group together in the order of them.
+            keys = tuple(key for _, _, key in sorted(ready) if self.__group(self.__pending[key][2]) == group)
+            self.__in_flight.update(keys)
+            return keys, [self.__pending.pop(key)[2] for key in keys]
+
+    def is_drained(self):
+        """Check the mailbox is closed and has no pending messages.
+        """
+        with self.__condition:
+            return self.__closed and not self.__pending
+
+    def done(self, key):
+        """Finish handling the message of the device ``key`` taken by ``get``, the tuple of the devices of a group.
+        """
+        with self.__condition:
+            self.__in_flight.difference_update(key if isinstance(key, tuple) else (key,))
+            self.__condition.notify_all()
+
+    def close(self):
+        """Close the mailbox, ``get`` returns None after the pending messages are drained.
+        """
+        with self.__condition:
+            self.__closed = True
+            self.__condition.notify_all()
+
+    def __len__(self):
+        with self.__condition:
+            return len(self.__pending)
+
+
+if __name__ == "__main__":
+    print("DeviceMailbox is an Import Module.")
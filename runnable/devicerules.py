@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+
+# Copyright (c) 2023 Patineboot. All rights reserved.
+# DeviceRules is licensed under CC BY-NC-ND 4.0.
+
+# Attribution-NonCommercial-NoDerivatives 4.0 International
+
+# Under the following terms:
+# Attribution — You must give appropriate credit, provide a
+# link to the license, and indicate if changes were made. You
+# may do so in any reasonable manner, but not in any way that
+# suggests the licensor endorses you or your use.
+# NonCommercial — You may not use the material for
+# commercial purposes.
+# NoDerivatives — If you remix, transform, or build upon the
+# material, you may not distribute the modified material.
+# No additional restrictions — You may not apply legal terms
+# or technological measures that legally restrict others from
+# doing anything the license permits.
+
+# Notices:
+# You do not have to comply with the license for elements of
+# the material in the public domain or where your use is
+# permitted by an applicable exception or limitation.
+
+# No warranties are given. The license may not give you all of
+# the permissions necessary for your intended use. For
+# example, other rights such as publicity, privacy, or moral
+# rights may limit how you use the material.
+
+import json
+from bisect import bisect_right
+
+from multilogger import traced
+
+######################
+#      Configure     #
+######################
+# the name of the infrared transmitter of a device without the transmitter attribute.
+DEFAULT_TRANSMITTER = "default"
+# the priority of an infrared code without the priority attribute, the smaller is sent earlier.
+DEFAULT_PRIORITY = 1
+
+######################
+#    Script Code     #
+######################
+LOGGER = None
+
+# the lower bound of a rule without the range characteristic.
+NO_LOWER_BOUND = float("-inf")
+
+
+class DeviceRule:
+    """DeviceRule class.
+
+    The DeviceRule class is the compiled rules of a device.
+    - Look up the exact values of the ``match`` characteristics in a dictionary.
+    - Bisect the lower bounds of the ``range`` characteristic.
+    """
+
+    def __init__(self, name, service, match, range_name, tables, transmitter=DEFAULT_TRANSMITTER, priorities=None):
+        self.name = name
+        self.service = service
+        self.transmitter = transmitter
+        self.__match = match
+        self.__range = range_name
+        # the tuple of the match values, None as any value, to the tuple of the lower bounds and the selections.
+        self.__tables = tables
+        # the patterns of the match values from the most specific.
+        patterns = {tuple(value is not None for value in key) for key in tables}
+        self.__patterns = sorted(patterns, key=lambda pattern: -sum(pattern))
+        # the infrared code to the priority.
+        self.__priorities = priorities or {}
+
+    def select(self, state):
+        """Select the infrared code for ``state``.
+        Args:
+            state: The characteristics of the device.
+        Returns:
+            The tuple of the infrared code and the characteristics to report, None if no rule matches.
+        """
+        values = tuple(state.get(characteristic) for characteristic in self.__match)
+
+        table = None
+        for pattern in self.__patterns:
+            key = tuple(value if used else None for value, used in zip(values, pattern))
+            table = self.__tables.get(key)
+            if table is not None:
+                break
+        if table is None:
+            return None
+
+        bounds, selections = table
+        value = state.get(self.__range) if self.__range else None
+        if value is None:
+            index = 0 if bounds[0] == NO_LOWER_BOUND else -1
+        else:
+            index = bisect_right(bounds, value) - 1
+        if index < 0:
+            return None
+        return selections[index]
+
+    def priority(self, state):
+        """Get the priority of the infrared code for ``state``, the smaller is sent earlier.
+        """
+        selection = self.select(state)
+        if selection is None:
+            return DEFAULT_PRIORITY
+        return self.__priorities.get(selection[0], DEFAULT_PRIORITY)
+
+    def infrared_codes(self):
+        return {code for _, selections in self.__tables.values() for code, _ in selections}
+
+
+class DeviceRules:
+    """DeviceRules class.
+
+    The DeviceRules class compiles the rules file of the infrared home devices at startup.
+    - The rules map the characteristics of a service to an infrared code and the characteristics to report.
+    - A device refers to the rules and fills the code templates with its own attributes.
+    - A device sends the infrared codes with the transmitter it refers to.
+    """
+
+    @traced
+    def __init__(self, logger, path):
+        """Create the device rules compiled from ``path``.
+        Args:
+            logger: The logger.
+            path: The path of the rules file.
+        Raises:
+            ValueError: The rules file is incorrect.
+        """
+        super().__init__()
+        global LOGGER
+        LOGGER = logger
+
+        with open(path, "r") as file:
+            description = json.load(file)
+
+        # the transmitter name to the LIRC device, None as the device of the infrared HAT.
+        self.__transmitters = description.get("transmitters", {DEFAULT_TRANSMITTER: None})
+        # the sensor name to the description of the sensor, None as the sensor of the infrared HAT.
+        self.__sensors = description.get("sensors")
+
+        self.__devices = {}
+        rules = description.get("rules", {})
+        for device_name, device in description.get("devices", {}).items():
+            rule_name = device.get("rules")
+            if rule_name not in rules:
+                raise ValueError(f"Not found the rules '{rule_name}' of the device '{device_name}' in {path}")
+            transmitter = device.get("transmitter", DEFAULT_TRANSMITTER)
+            if transmitter not in self.__transmitters:
+                raise ValueError(f"Not found the transmitter '{transmitter}' of the device '{device_name}' in {path}")
+            self.__devices[device_name] = self.__compile(device_name, device, rules[rule_name])
+
+        LOGGER.info(f"Device rules: compiled {len(self.__devices)} devices on "
+                    f"{len(self.__transmitters)} transmitters from {path}")
+
+    def get(self, device_name):
+        """Get the compiled rules of the device named ``device_name``.
+        Returns:
+            The DeviceRule, None if the device is not described.
+        """
+        return self.__devices.get(device_name)
+
+    def transmitters(self):
+        """Get the infrared transmitters of the devices.
+        Returns:
+            The dictionary of the transmitter name to the LIRC device, None as the device of the infrared HAT.
+        """
+        return dict(self.__transmitters)
+
+    def sensors(self):
+        """Get the sensors to poll.
+        Returns:
+            The dictionary of the sensor name to the description of the sensor, None if not described.
+        """
+        return None if self.__sensors is None else dict(self.__sensors)
+
+    def infrared_codes(self):
+        """Get all the infrared codes the devices can send.
+        """
+        infrared_codes = set()
+        for device in self.__devices.values():
+            infrared_codes |= device.infrared_codes()
+        return infrared_codes
+
+    def __compile(self, device_name, device, rule):
+        match = rule.get("match", [])
+        range_name = rule.get("range")
+
+        rows = {}
+        priorities = {}
+        for code in rule.get("codes", []):
+            key = tuple(code.get(characteristic) for characteristic in match)
+            bound = code.get(range_name, NO_LOWER_BOUND) if range_name else NO_LOWER_BOUND
+            if not isinstance(bound, (int, float)) or isinstance(bound, bool):
+                raise ValueError(f"The lower bound of '{range_name}' is not a number: {code}")
+            try:
+                infrared_code = code["code"].format(**device)
+            except (KeyError, AttributeError) as error:
+                raise ValueError(f"Incorrect code of the device '{device_name}': {code}, {error}")
+            report = code.get("report", {})
+            if "priority" in code:
+                priorities[infrared_code] = code["priority"]
+            rows.setdefault(key, {})[bound] = (infrared_code, report)
+
+        tables = {}
+        for key, row in rows.items():
+            bounds = sorted(row)
+            tables[key] = (bounds, [row[bound] for bound in bounds])
+
+        return DeviceRule(device_name, rule.get("service"), match, range_name, tables,
+                          device.get("transmitter", DEFAULT_TRANSMITTER), priorities)
+
+
+if __name__ == "__main__":
+    print("DeviceRules is an Import Module.")
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+
+# Copyright (c) 2023 Patineboot. All rights reserved.
+# FakeDevices is licensed under CC BY-NC-ND 4.0.
+
+# Attribution-NonCommercial-NoDerivatives 4.0 International
+
+# Under the following terms:
+# Attribution — You must give appropriate credit, provide a
+# link to the license, and indicate if changes were made. You
+# may do so in any reasonable manner, but not in any way that
+# suggests the licensor endorses you or your use.
+# NonCommercial — You may not use the material for
+# commercial purposes.
+# NoDerivatives — If you remix, transform, or build upon the
+# material, you may not distribute the modified material.
+# No additional restrictions — You may not apply legal terms
+# or technological measures that legally restrict others from
+# doing anything the license permits.
+
+# Notices:
+# You do not have to comply with the license for elements of
+# the material in the public domain or where your use is
+# permitted by an applicable exception or limitation.
+
+# No warranties are given. The license may not give you all of
+# the permissions necessary for your intended use. For
+# example, other rights such as publicity, privacy, or moral
+# rights may limit how you use the material.
+
+import time
+import random
+import asyncio
+
+from multilogger import traced
+
+######################
+#      Configure     #
+######################
+# the first readings of the fake sensor.
+FAKE_HUMIDITY = 40.0
+FAKE_TEMPERATURE = 22.5
+
+######################
+#    Script Code     #
+######################
+LOGGER = None
+
+
+class FakeTransmitter:
+    """FakeTransmitter class.
+
+    The FakeTransmitter class takes the place of IrTransmitter without the infrared HAT.
+    - Take ``latency`` seconds to send an infrared code as the LIRC driver does.
+    - Count the sent infrared codes.
+    """
+
+    @traced
+    def __init__(self, logger, latency=0.0):
+        """Create a fake transmitter.
+        Args:
+            logger: The logger.
+            latency: The seconds to send an infrared code.
+        """
+        super().__init__()
+        global LOGGER
+        LOGGER = logger
+
+        self.__latency = latency
+        self.sent = 0
+
+    def open(self):
+        return True
+
+    def close(self):
+        pass
+
+    def transmit(self, infrared_code):
+        if self.__latency > 0:
+            time.sleep(self.__latency)
+        self.sent += 1
+        LOGGER.info("Infrared: fake %s", infrared_code)
+
+    def transmit_many(self, infrared_codes):
+        for infrared_code in infrared_codes:
+            self.transmit(infrared_code)
+
+    async def transmit_async(self, infrared_code):
+        if self.__latency > 0:
+            await asyncio.sleep(self.__latency)
+        self.sent += 1
+        LOGGER.info("Infrared: fake %s", infrared_code)
+
+    async def transmit_many_async(self, infrared_codes):
+        for infrared_code in infrared_codes:
+            await self.transmit_async(infrared_code)
+
+
+class FakeBME280:
+    """FakeBME280 class.
+
+    The FakeBME280 class takes the place of cgsensor.BME280 without the infrared HAT.
+    - Take ``latency`` seconds to measure as the forced mode does.
+    - Walk the readings randomly by ``noise`` at most per measurement.
+    """
+
+    def __init__(self, latency=0.0, noise=0.0, seed=None):
+        """Create a fake sensor.
+        Args:
+            latency: The seconds to measure.
+            noise: The change of the readings per measurement at most.
+            seed: The seed of the random walk.
+        """
+        super().__init__()
+
+        self.__latency = latency
+        self.__noise = noise
+        self.__random = random.Random(seed)
+        self.humidity = FAKE_HUMIDITY
+        self.temperature = FAKE_TEMPERATURE
+
+    def forced(self):
+        if self.__latency > 0:
+            time.sleep(self.__latency)
+        self.humidity += self.__random.uniform(-self.__noise, self.__noise)
+        self.temperature += self.__random.uniform(-self.__noise, self.__noise)
+
+
+if __name__ == "__main__":
+    print("FakeDevices is an Import Module.")
@@ -31,13 +31,53 @@
 # Python 3.8 or later supports the Final feature
 # from typing import Final
 
+import os
 import sys
-import json
+import signal
 
+from time import time
+from time import perf_counter
 from threading import Thread
-from threading import Lock
+from threading import get_ident
+from threading import Event
+from threading import Condition
 
 from rpzirsensor import RpzIrSensor
+from transmitscheduler import TransmitScheduler
+from transmitcache import TransmitCache
+from devicerules import DeviceRules
+from devicerules import DEFAULT_PRIORITY
+from jsoncodec import JsonCodec
+from messagewriter import MessageWriter
+from runnablemetrics import RunnableMetrics
+from runnablemetrics import METRICS_INTERVAL
+from trafficcapture import TrafficCapture
+from statesnapshot import StateSnapshot
+from statecache import StateCache
+from sensorhistory import SensorHistory
+from supervisor import Supervisor
+from circuitbreaker import CircuitOpenError
+from runnablemessage import SetMessage
+from runnablemessage import AckMessage
+from multilogger import traced
+
+######################
+#      Configure     #
+######################
+# the rules file of the infrared home devices.
+DEVICE_RULES_JSON = os.path.join(os.path.dirname(__file__), "devices.json")
+
+# the seconds to skip sending the same infrared code to a device again.
+TRANSMIT_CACHE_TTL = 300
+
+# the seconds a command waits for the transmitter before it is dropped as stale.
+COMMAND_DEADLINE = 10
+
+# the seconds to answer the pending requests of a disconnecting client of the daemon.
+CLIENT_DRAIN_TIMEOUT = 30
+
+# the seconds of the range of a HISTORY request without the start.
+HISTORY_RANGE = 86400
 
 ######################
 #    Script Code     #
@@ -50,202 +90,704 @@ class InfraredRunnable:
 
     The InfraredRunnable class sends some infrared codes to home devices.
     - Send the infrared codes pre-registered with an infrared HAT.
+    - Serve the standard input and output, or the clients of a Unix domain socket as a daemon.
+    - Answer a request to the writer of the client of it, and send the reports to all the clients.
+    - Answer a GET request from the state cache in memory, read the sensor only for a stale value.
+    - Send the infrared codes of a scene, a batch frame of the messages, back-to-back per transmitter.
+    - Restart a failed stage in place, and answer a failed message without stopping the others.
     """
 
-    def __init__(self, logger, dryrun):
-        """Create a infrared home device specified ``state_file`` and ``device_name``.
+    @traced
+    def __init__(self, logger, dryrun, cache_ttl=TRANSMIT_CACHE_TTL, use_asyncio=False, codec_name="auto",
+                 metrics_file=None, metrics_interval=METRICS_INTERVAL, capture_file=None, backends=None,
+                 rules_file=DEVICE_RULES_JSON, deadline=COMMAND_DEADLINE, startup_profile=None, state_file=None,
+                 history_file=None):
+        """Create the infrared home devices of ``rules_file``.
         Args:
-            state_file: The name of the state file.
-            device_name: The name of the infrared home device.
+            logger: The logger.
+            dryrun: Not send the infrared codes if True.
+            cache_ttl: The seconds to skip sending the same infrared code to a device again.
+            use_asyncio: Run the stages as tasks on an asyncio event loop instead of threads.
+            codec_name: The name of the JSON codec of the messages.
+            metrics_file: The Prometheus text file to rewrite the metrics, not written if None.
+            metrics_interval: The seconds to rewrite the metrics file.
+            capture_file: The JSONL file to record the received lines to replay, not recorded if None.
+            backends: The keyword arguments of RpzIrSensor to replace the hardware,
+                ``transmitter_factory``, ``sensor_devices`` and ``policy``.
+            rules_file: The rules file of the infrared home devices.
+            deadline: The seconds a command waits for the transmitter before it is dropped, 0 never drops it.
+            startup_profile: The StartupProfile to finish on reading the first message, not measured if None.
+            state_file: The snapshot file of the last state to restart warm, not written if None.
+            history_file: The time series file to record the sensor readings, not recorded if None.
         """
         super().__init__()
         global LOGGER
         LOGGER = logger
 
-        LOGGER.debug(f"STR")
-
-        self.__lock = Lock()
-        self.__ir_sensor = RpzIrSensor(logger, dryrun, self)
-
-        LOGGER.debug(f"END")
-
-    def run(self):
-        LOGGER.debug(f"STR")
-
-        thread = Thread(target=self.__loop)
-        thread.start()
-        self.__ir_sensor.start()
+        self.__use_asyncio = use_asyncio
+        self.__startup_profile = startup_profile
+        self.__deadline = deadline if deadline > 0 else float("inf")
+        self.__codec = JsonCodec(logger, codec_name)
+        self.__writer = MessageWriter(logger, self.__codec)
+        # the writers of the clients to the number of the requests waiting for the answers.
+        self.__clients = {}
+        self.__clients_condition = Condition()
+        self.__transmit_cache = TransmitCache(logger, cache_ttl)
+        self.__state_cache = StateCache(logger)
+        # the event loop of the asyncio mode to answer on it, None on the threads.
+        self.__event_loop = None
+        self.__event_loop_thread = None
+        self.__snapshot = None
+        if state_file is not None:
+            self.__snapshot = StateSnapshot(logger, state_file)
+            # not send the infrared code again the device received before the restart within the cache ttl.
+            now = time()
+            for device_name, device in self.__snapshot.get("devices").items():
+                if "code" in device and "sent" in device:
+                    self.__transmit_cache.store(device_name, device["code"], device.get("report", {}),
+                                                max(now - device["sent"], 0))
+            # the values before the restart are too old for any max age.
+            for name, characteristics in self.__snapshot.get("reports").items():
+                self.__state_cache.update(name, characteristics, float("-inf"))
+        self.__device_rules = DeviceRules(logger, rules_file)
+        transmitters = self.__device_rules.transmitters()
+        # a worker per transmitter, the transmitters send the infrared codes concurrently.
+        # the parts of a scene are the messages of the devices taken together.
+        self.__scheduler = TransmitScheduler(logger, transmitters, self.__coalesce, self.__scene_of, self.__prioritize)
+        self.__metrics_file = metrics_file
+        self.__metrics_interval = metrics_interval
+        self.__metrics = RunnableMetrics(logger)
+        self.__metrics.register_gauge("mailbox_depth", lambda: len(self.__scheduler))
+        self.__metrics.register_gauge("writer_queue_depth", self.__writer.qsize)
+        self.__supervisor = Supervisor(logger, self.__metrics)
+        self.__capture = TrafficCapture(logger, capture_file) if capture_file is not None else None
+        self.__history = SensorHistory(logger, history_file) if history_file is not None else None
+        self.__ir_sensor = RpzIrSensor(logger, dryrun, self, self.__metrics, transmitters,
+                                       state_cache=self.__state_cache, history=self.__history,
+                                       sensors=self.__device_rules.sensors(), **(backends or {}))
+        # turn a missing infrared code into a startup error.
+        self.__ir_sensor.require_codes(self.__device_rules.infrared_codes())
+
+    @traced
+    def run(self, socket_path=None):
+        """Handle the messages of the standard input until it is closed,
+        or of the clients of the socket file ``socket_path`` until SIGTERM or SIGINT.
+        """
+        if self.__metrics_file is not None:
+            self.__metrics.start(self.__metrics_file, self.__metrics_interval)
+        if self.__snapshot is not None:
+            self.__snapshot.start()
+        try:
+            if socket_path is not None:
+                self.__serve(socket_path)
+            elif self.__use_asyncio:
+                # the threads mode never loads asyncio.
+                import asyncio
+                asyncio.run(self.__run_async())
+            else:
+                self.__run_threads()
+        finally:
+            self.__metrics.stop()
+            if self.__snapshot is not None:
+                self.__snapshot.stop()
+            if self.__capture is not None:
+                self.__capture.close()
+            if self.__history is not None:
+                self.__history.close()
+
+    @traced
+    def __serve(self, socket_path):
+        from runnabledaemon import RunnableDaemon
+
+        if self.__use_asyncio:
+            LOGGER.warning("The daemon runs on the threads, not on the asyncio mode.")
+
+        stopped = Event()
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, lambda signum, frame: stopped.set())
+
+        daemon = RunnableDaemon(LOGGER, socket_path, self.__codec, self)
+        self.__scheduler.start(self.__dispatch)
+        self.__supervisor.start("sensor", self.__ir_sensor.run)
+        try:
+            daemon.start()
+            if self.__startup_profile is not None:
+                self.__startup_profile.finish("listen on the socket")
+            stopped.wait()
+        finally:
+            # disconnect the clients after answering their pending requests.
+            daemon.stop()
+            self.__scheduler.close()
+            self.__scheduler.join()
+            self.__supervisor.stop()
+            self.__ir_sensor.stop()
+
+    @traced
+    def __run_threads(self):
+        # the writer drains the last known values of the snapshot published on attaching.
+        self.__writer.start()
+        self.attach(self.__writer)
+        thread = self.__supervisor.start("reader", self.__loop)
+        self.__scheduler.start(self.__dispatch)
+        self.__supervisor.start("sensor", self.__ir_sensor.run)
 
         # wait for closing stdin
         thread.join()
+        # wait for handling the pending messages
+        self.__scheduler.join()
+        # wait for writing the sent messages
+        self.__supervisor.stop()
+        self.__ir_sensor.stop()
+        self.__writer.stop()
+
+    @traced
+    async def __run_async(self):
+        import asyncio
+
+        self.__event_loop = asyncio.get_event_loop()
+        self.__event_loop_thread = get_ident()
+        writer = asyncio.ensure_future(self.__writer.run_async())
+        # let the writer task create its queue before publishing the last known values on attaching.
+        await asyncio.sleep(0)
+        self.attach(self.__writer)
+        transmitter = asyncio.ensure_future(self.__scheduler.run_async(self.__dispatch_async))
+        sensor = asyncio.ensure_future(self.__supervisor.run_async("sensor", self.__ir_sensor.run_async))
+
+        try:
+            # wait for closing stdin
+            await self.__supervisor.run_async("reader", self.__loop_async)
+            # wait for handling the pending messages
+            self.__scheduler.close()
+            await transmitter
+            # wait for writing the sent messages
+            await self.__writer.join_async()
+        finally:
+            for task in (writer, transmitter, sensor):
+                task.cancel()
+            self.__supervisor.stop()
+            self.__ir_sensor.stop()
+
+    @traced
+    async def __loop_async(self):
+        import asyncio
+
+        loop = asyncio.get_event_loop()
+        reader = asyncio.StreamReader()
+        try:
+            await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin.buffer)
+        except ValueError:
+            # a regular file is not a pipe, read it on the default executor instead.
+            reader = None
+
+        while True:
+            # read the next line after the writer catches up with the answers.
+            await self.__writer.drain_async()
+            if reader is not None:
+                line = await reader.readline()
+            else:
+                line = await loop.run_in_executor(None, sys.stdin.buffer.readline)
+            if not line:
+                break
+            self.receive(line, self.__writer)
 
-        LOGGER.debug(f"END")
-
+    @traced
     def __loop(self):
-        LOGGER.debug(f"STR")
+        for line in sys.stdin.buffer:
+            self.receive(line, self.__writer)
+        self.__scheduler.close()
 
-        for line in sys.stdin:
-            LOGGER.info(f"received: {line.strip()}")
-            self.__handle(line)
-        LOGGER.debug(f"END")
-
-    def __handle(self, line):
-        message = json.loads(line)
+    def attach(self, writer):
+        """Send the reports to the client of ``writer`` from now.
+        """
+        with self.__clients_condition:
+            self.__clients[writer] = 0
 
-        if message["method"] != "SET":
+        # publish the last known values before the restart until the devices and the sensors report.
+        if self.__snapshot is None:
             return
+        for name, characteristics in self.__snapshot.get("reports").items():
+            for characteristic, value in characteristics.items():
+                writer.write(SetMessage(name, characteristic, value))
 
-        # the prefix names of Lightbulb
-        lightbulb_name = {
-            "BrightLight": "brightlight",
-            "DimLight": "dimlight",
-        }
+    def detach(self, writer, timeout=CLIENT_DRAIN_TIMEOUT):
+        """Stop sending the reports to the client of ``writer`` after answering its pending requests.
+        """
+        with self.__clients_condition:
+            if not self.__clients_condition.wait_for(lambda: self.__clients.get(writer, 0) == 0, timeout):
+                LOGGER.warning(f"Not answered {self.__clients[writer]} requests of a disconnecting client")
+            self.__clients.pop(writer, None)
 
-        heatercooler_name = [
-            "AirConditioner",
-        ]
+    def receive(self, line, writer):
+        """Handle the received ``line`` and answer it to ``writer``.
+        """
+        if self.__startup_profile is not None:
+            self.__startup_profile.finish("read the first message")
+            self.__startup_profile = None
+        # a line of the invalid UTF-8 is logged as is and rejected by the codec.
+        LOGGER.info("received: %s", line.decode(errors="replace").strip())
+        received = perf_counter()
+        self.__metrics.increment("messages_received")
+
+        # a bad line never stops handling the next lines.
+        try:
+            self.__receive_line(line, writer, received)
+        except Exception as error:
+            LOGGER.error(f"Failed to handle the received line: {error!r}")
+            self.__metrics.increment("messages_failed")
+
+    def __receive_line(self, line, writer, received):
+        message = self.__codec.decode(line)
+        # record the decoded lines only, the capture stays a JSONL file to replay.
+        if self.__capture is not None:
+            self.__capture.record(line)
+
+        # a batch frame of the messages runs as a scene.
+        if isinstance(message, list):
+            self.__receive_scene(message, writer, received)
+            return
+        if message["method"] == "SCENE":
+            self.__receive_scene(message["messages"], writer, received, message)
+            return
+        self.__receive_message(message, writer, received)
 
-        device_name = message["name"]
-        if device_name in lightbulb_name:
-            self.__handle_lightbulb(message, lightbulb_name)
-        elif device_name in heatercooler_name:
-            self.__handle_heatercooler(message)
+    def __receive_message(self, message, writer, received):
+        if message["method"] == "STATS":
+            self.__reply_stats(message, writer)
+            return
+        if message["method"] == "GET":
+            self.__get(message, writer)
+            return
+        if message["method"] == "HISTORY":
+            self.__reply_history(message, writer)
+            return
+        if message["method"] != "SET":
+            return
 
-    def __handle_lightbulb(self, message, lightbulb_name):
-        LOGGER.debug(f"STR: {message}, {lightbulb_name}")
+        request = message
+        message = self.__parse(request, writer)
+        if message is None:
+            return
+        self.__force(request)
+        ids = self.__take_ids(request, writer)
+
+        # hand the message to the worker of the transmitter without waiting for the infrared.
+        device_name = message.name
+        rule = self.__device_rules.get(device_name)
+        if rule is not None:
+            # the urgent infrared codes as turning off jump ahead of the other devices.
+            priority = self.__priority(rule, message)
+            taken = (message, ids, received, received + self.__deadline, ())
+            if self.__scheduler.put(rule.transmitter, device_name, taken, priority):
+                self.__metrics.increment("messages_coalesced")
+        else:
+            self.__acknowledge(message, ids, message.state())
+        self.__metrics.observe("receive", perf_counter() - received)
+
+    def __receive_scene(self, messages, writer, received, scene=None):
+        self.__metrics.increment("scenes_received")
+        deadline = received + self.__deadline
+
+        # merge the changes of a device into one change, the later change wins.
+        merged = {}
+        for request in messages:
+            if not isinstance(request, dict):
+                LOGGER.warning(f"Skip the part of the scene not a message: {request!r}")
+                continue
+            if request.get("method") != "SET":
+                # a bad message never stops the parts of the scene with the ids taken.
+                try:
+                    self.__receive_message(request, writer, received)
+                except Exception as error:
+                    LOGGER.error(f"Failed to handle the message of the scene: {error!r}")
+                    self.__metrics.increment("messages_failed")
+                continue
+            message = self.__parse(request, writer)
+            if message is None:
+                continue
+            self.__force(request)
+            ids = self.__take_ids(request, writer)
+            taken = (message, ids, received, deadline, ())
+            device_name = message.name
+            merged[device_name] = self.__coalesce(merged[device_name], taken) if device_name in merged else taken
+
+        parts = []
+        for message, ids, _, _, _ in merged.values():
+            rule = self.__device_rules.get(message.name)
+            if rule is None:
+                self.__acknowledge(message, ids, message.state())
+                continue
+            parts.append((rule, message, ids))
+
+        # a part of the scene merges into the pending message of the device, and a later message of the device
+        # merges into the pending part, so the last change of a device always wins.
+        # the parts on a transmitter are taken together at the priority of the most urgent one of them.
+        finish = self.__finish_scene(scene, writer, len(parts))
+        for rule, message, ids in parts:
+            taken = (message, ids, received, deadline, (finish,))
+            if self.__scheduler.put(rule.transmitter, message.name, taken, self.__priority(rule, message)):
+                self.__metrics.increment("messages_coalesced")
+        self.__metrics.observe("receive", perf_counter() - received)
+
+    def __finish_scene(self, scene, writer, parts):
+        # answer the request of the scene after the transmitters sent all the parts of it.
+        if scene is None or "id" not in scene:
+            return lambda: None
+
+        self.__wait_answer(writer)
+        answer = AckMessage(scene.get("name"), scene["id"], {})
+        remaining = [parts]
+
+        def finish():
+            with self.__clients_condition:
+                remaining[0] -= 1
+                if remaining[0] > 0:
+                    return
+            self.__answer(writer, answer)
+
+        if parts == 0:
+            self.__answer(writer, answer)
+        return finish
+
+    def __parse(self, request, writer):
+        # a malformed message is answered as failed before taking the id, the client never waits for it.
+        try:
+            message = SetMessage.from_dict(request)
+            if not isinstance(message.status, dict):
+                raise TypeError(f"The status is not an object: {message.status!r}")
+            return message
+        except (KeyError, TypeError) as error:
+            LOGGER.error(f"Failed to parse the message: {error!r}")
+            self.__metrics.increment("messages_failed")
+            if "id" in request:
+                writer.write(AckMessage(request.get("name"), request["id"], {}, "failed"))
+            return None
+
+    def __priority(self, rule, message):
+        # a state the rules cannot select fails on the worker of the transmitter and is answered there.
+        try:
+            return rule.priority(message.state())
+        except (TypeError, ValueError):
+            return DEFAULT_PRIORITY
+
+    def __force(self, message):
+        # a forced message sends the infrared code even if the device received it within the cache ttl,
+        # e.g., after the physical remote changed the device.
+        if message.get("force"):
+            self.__transmit_cache.invalidate(message["name"])
+
+    def __take_ids(self, message, writer):
+        # the request id is answered with an ACK message to the writer, not echoed in the reports.
+        ids = []
+        if "id" in message:
+            ids.append((writer, message.pop("id")))
+            self.__wait_answer(writer)
+        return ids
+
+    def __wait_answer(self, writer):
+        # the client of the writer waits for one more answer before detaching.
+        with self.__clients_condition:
+            self.__clients[writer] = self.__clients.get(writer, 0) + 1
+
+    def __get(self, message, writer):
+        name = message["name"]
+        max_age = message.get("max_age")
+        if "id" in message:
+            self.__wait_answer(writer)
+
+        _, age = self.__state_cache.get(name, message.get("characteristic"))
+        # never touch the sensor for a fresh value or without any max age.
+        if max_age is None or (age is not None and age <= max_age) or not self.__ir_sensor.is_sensor(name):
+            self.__answer_get(message, writer)
+            return
 
-        prefix = lightbulb_name[message["name"]]
-        state = {
-            "On": message["status"]["On"],
-            "Brightness": message["status"]["Brightness"],
-        }
-        state[message["characteristic"]] = message["value"]
-
-        # change the device state to the status.
-        infrared = self.__select_lightbulb_code(state, prefix)
-        self.__ir_sensor.flash(infrared)
-
-    def __select_lightbulb_code(self, state, prefix):
-        LOGGER.debug(f"STR: {state} {prefix}")
-
-        # select an infrared code with the 'On' and 'Brightness' attributes.
-        selected_code = None
-
-        on = state["On"]
-        brightness = state["Brightness"]
-
-        # the 'On' element
-        if on:
-            # the 'Brightness' element.
-            # 100% Brightness.
-            if brightness == 100:
-                selected_code = prefix + "_full"
-            # 0% Brightness.
-            elif brightness == 0:
-                selected_code = prefix + "_off"
-            # Brightness less than 20%.
-            elif brightness <= 20:
-                selected_code = prefix + "_night"
-            # 20% < Brightness < 100%
-            else:
-                selected_code = prefix + "_preference"
+        # read the sensor out of the reader, the reader keeps receiving the messages meanwhile.
+        answer = lambda: self.__answer_get(message, writer)
+        if self.__event_loop is not None:
+            self.__event_loop.run_in_executor(None, self.__refresh, name, answer)
+        else:
+            Thread(target=self.__refresh, args=(name, answer)).start()
+
+    def __refresh(self, name, answer):
+        # the concurrent requesters of the stale values share one reading of the sensor of the accessory.
+        try:
+            self.__ir_sensor.refresh(name)
+        except Exception as error:
+            LOGGER.error(f"Failed to read the sensor: {error}")
+
+        # the writer of the asyncio mode is written on the event loop only.
+        if self.__event_loop is not None:
+            self.__event_loop.call_soon_threadsafe(answer)
         else:
-            selected_code = prefix + "_off"
+            answer()
 
-        return selected_code
+    def __answer_get(self, message, writer):
+        status, _ = self.__state_cache.get(message["name"], message.get("characteristic"))
+        if "id" not in message:
+            writer.write(AckMessage(message["name"], None, status))
+            return
+        self.__answer(writer, AckMessage(message["name"], message["id"], status))
+
+    def __coalesce(self, pending, received):
+        pending_message, pending_ids, pending_received, _, pending_finishes = pending
+        message, ids, _, deadline, finishes = received
+        # keep the change of the pending message unless the newer message overrides it.
+        if pending_message.characteristic != message.characteristic:
+            message.status[pending_message.characteristic] = pending_message.value
+        # the requests of the pending message complete with the newer one by the newer deadline,
+        # and the scenes of the pending message finish with the newer one.
+        return message, pending_ids + ids, pending_received, deadline, pending_finishes + finishes
+
+    def __prioritize(self, taken):
+        message = taken[0]
+        return self.__priority(self.__device_rules.get(message.name), message)
+
+    def __scene_of(self, taken):
+        # the finish function of the last scene identifies the parts of it.
+        finishes = taken[4]
+        return finishes[-1] if finishes else None
+
+    def __dispatch(self, transmitter, device_name, taken):
+        # a failed message never stops the worker of the transmitter.
+        try:
+            # the key of the parts of a scene is the tuple of the devices, the key of a device is the name.
+            if isinstance(device_name, tuple):
+                self.__handle_scene(transmitter, taken)
+                return
+            message, ids, received, deadline, _ = taken
+            if self.__is_stale(message, ids, received, deadline):
+                return
+            self.__handle(transmitter, message, ids, received)
+        except Exception as error:
+            self.__fail(device_name, taken, error)
+        finally:
+            self.__finish(device_name, taken)
+
+    async def __dispatch_async(self, transmitter, device_name, taken):
+        try:
+            if isinstance(device_name, tuple):
+                await self.__handle_scene_async(transmitter, taken)
+                return
+            message, ids, received, deadline, _ = taken
+            if self.__is_stale(message, ids, received, deadline):
+                return
+            await self.__handle_async(transmitter, message, ids, received)
+        except Exception as error:
+            self.__fail(device_name, taken, error)
+        finally:
+            self.__finish(device_name, taken)
+
+    def __fail(self, device_name, taken, error):
+        target = "a scene" if isinstance(device_name, tuple) else device_name
+        if isinstance(error, CircuitOpenError):
+            LOGGER.warning(f"Failed fast the message of {target}: {error}")
+        else:
+            LOGGER.error(f"Failed to handle the message of {target}: {error!r}")
+
+        parts = taken if isinstance(device_name, tuple) else [taken]
+        for message, ids, _, _, _ in parts:
+            self.__reject(message, ids, "failed")
+
+    def __finish(self, device_name, taken):
+        # a part of a scene counts as done whether it was sent, dropped or failed.
+        parts = taken if isinstance(device_name, tuple) else [taken]
+        for _, _, _, _, finishes in parts:
+            for finish in finishes:
+                finish()
+
+    def __is_stale(self, message, ids, received, deadline):
+        now = perf_counter()
+        self.__metrics.observe("queue", now - received)
+        if now <= deadline:
+            return False
+
+        LOGGER.warning("Dropped the stale message of %s after %.3f seconds: %s = %s",
+                       message.name, now - received, message.characteristic, message.value)
+        self.__reject(message, ids, "dropped")
+        return True
+
+    def __reject(self, message, ids, reason):
+        self.__metrics.increment(f"messages_{reason}")
+
+        # the device stays in the status without the change.
+        for writer, request_id in ids:
+            self.__answer(writer, AckMessage(message.name, request_id, message.status, reason))
+        # turn the characteristic on Homebridge back to the status of the device.
+        if message.characteristic in message.status:
+            self.send(SetMessage(message.name, message.characteristic, message.status[message.characteristic]))
+
+    @traced
+    def __handle(self, transmitter, message, ids, received):
+        plan = self.__plan(message)
+        if plan is None:
+            self.__acknowledge(message, ids, message.state())
+            return
+        device_name, infrared, report = plan
 
-    def __handle_heatercooler(self, message):
-        LOGGER.debug(f"STR: {message}")
+        # skip the infrared code if the device is already in the state of it.
+        if not self.__is_cached(device_name, infrared):
+            self.__ir_sensor.flash(infrared, transmitter)
+            self.__store(device_name, infrared, report)
 
-        # chaneg the device state to the status.
-        state = {
-            "Active": message["status"]["Active"],
-            # "CurrentHeaterCoolerState": message["status"]["CurrentHeaterCoolerState"],
-            "TargetHeaterCoolerState": message["status"]["TargetHeaterCoolerState"],
-            # "CurrentTemperature": message["status"]["CurrentTemperature"],
+        self.__reply(message, ids, report, received)
 
-            "HeatingThresholdTemperature": message["status"]["HeatingThresholdTemperature"],
+    @traced
+    async def __handle_async(self, transmitter, message, ids, received):
+        plan = self.__plan(message)
+        if plan is None:
+            self.__acknowledge(message, ids, message.state())
+            return
+        device_name, infrared, report = plan
+
+        # skip the infrared code if the device is already in the state of it.
+        if not self.__is_cached(device_name, infrared):
+            await self.__ir_sensor.flash_async(infrared, transmitter)
+            self.__store(device_name, infrared, report)
+
+        self.__reply(message, ids, report, received)
+
+    @traced
+    def __handle_scene(self, transmitter, parts):
+        entries, sending = self.__plan_scene(parts)
+        if sending:
+            self.__ir_sensor.flash_many([infrared for _, _, _, _, infrared, _ in sending], transmitter)
+        self.__reply_scene(entries, sending)
+
+    @traced
+    async def __handle_scene_async(self, transmitter, parts):
+        entries, sending = self.__plan_scene(parts)
+        if sending:
+            await self.__ir_sensor.flash_many_async([infrared for _, _, _, _, infrared, _ in sending], transmitter)
+        self.__reply_scene(entries, sending)
+
+    def __plan_scene(self, parts):
+        # resolve the infrared codes of all the parts before sending any of them.
+        entries = []
+        for message, ids, received, deadline, _ in parts:
+            if self.__is_stale(message, ids, received, deadline):
+                continue
+            # a malformed part fails alone, the other parts of the scene are sent.
+            try:
+                plan = self.__plan(message)
+            except (TypeError, ValueError) as error:
+                LOGGER.error(f"Failed to select the infrared code of {message.name}: {error!r}")
+                self.__reject(message, ids, "failed")
+                continue
+            if plan is None:
+                self.__acknowledge(message, ids, message.state())
+                continue
+            entries.append((message, ids, received) + plan)
+        # skip the infrared codes of the devices already in the states of them.
+        sending = [entry for entry in entries if not self.__is_cached(entry[3], entry[4])]
+        return entries, sending
+
+    def __reply_scene(self, entries, sending):
+        for _, _, _, device_name, infrared, report in sending:
+            self.__store(device_name, infrared, report)
+        for message, ids, received, _, _, report in entries:
+            self.__reply(message, ids, report, received)
+
+    def __store(self, device_name, infrared, report):
+        self.__transmit_cache.store(device_name, infrared, report)
+        if self.__snapshot is not None:
+            self.__snapshot.update("devices", device_name, {"code": infrared, "report": report, "sent": time()})
+
+    def __plan(self, message):
+        started = perf_counter()
+        rule = self.__device_rules.get(message.name)
+        state = message.state()
+
+        selection = rule.select(state)
+        if selection is None:
+            LOGGER.warning("Not found any rules of %s for %s", rule.name, state)
+            return None
+        infrared, report = selection
+        self.__metrics.observe("select", perf_counter() - started)
+        return rule.name, infrared, report
+
+    def __is_cached(self, device_name, infrared):
+        if self.__transmit_cache.lookup(device_name, infrared) is None:
+            return False
+        LOGGER.info("Infrared: %s is cached for %s", infrared, device_name)
+        self.__metrics.increment("ir_cached")
+        return True
+
+    def __acknowledge(self, message, ids, status):
+        for writer, request_id in ids:
+            self.__answer(writer, AckMessage(message.name, request_id, status))
+
+    def __answer(self, writer, message):
+        writer.write(message)
+        with self.__clients_condition:
+            if writer in self.__clients:
+                self.__clients[writer] -= 1
+                self.__clients_condition.notify_all()
+
+    def __report(self, message, report):
+        # send the characteristics due to changing the device state
+        for characteristic, value in report.items():
+            self.send(SetMessage(message.name, characteristic, value))
+
+    def __reply(self, message, ids, report, received):
+        started = perf_counter()
+        # the resulting status of the device.
+        status = message.state()
+        status.update(report)
+        # answer the requests as soon as the transmitter emitted the infrared code.
+        self.__acknowledge(message, ids, status)
+        self.__state_cache.update(message.name, status)
+        self.__report(message, report)
+        finished = perf_counter()
+        self.__metrics.observe("reply", finished - started)
+        self.__metrics.observe("total", finished - received)
+
+    def __reply_stats(self, message, writer):
+        stats = {
+            "method": "STATS",
+            "stats": self.__metrics.snapshot(),
         }
-        state[message["characteristic"]] = message["value"]
-
-        infrared, current_state, temperature = self.__select_airconditioner_code(state)
-        self.__ir_sensor.flash(infrared)
-
-        # make the message to send the device status from the receive message
-        # update the status in the message
-        message["status"][message["characteristic"]] = message["value"]
-        # send CurrentHeaterCoolerState due to changing TargetHeaterCoolerState
-        message["characteristic"] = "CurrentHeaterCoolerState"
-        message["value"] = current_state
-        self.send(message)
-
-        # update the status in the message
-        message["status"][message["characteristic"]] = message["value"]
-        # send CurrentTemperature due to changing TargetHeaterCoolerState
-        message["characteristic"] = "CurrentTemperature"
-        message["value"] = temperature
-        self.send(message)
-
-    def __select_airconditioner_code(self, state):
-        LOGGER.debug(f"STR: {state}")
-
-        # select an infrared code with
-        # the 'Active' and 'TargetHeaterCoolerState' and HeatingThresholdTemperature attributes.
-        selected_code = None
-        temperature = 0
-        current_state = 0
-
-        active = state["Active"]
-        target_heater_cooler_state = state["TargetHeaterCoolerState"]
-        heating_threshold_temperature = state["HeatingThresholdTemperature"]
-
-        # the 'Active' element is 'INACTIVE'
-        if active == 0:
-            selected_code = "aircon_off"
-            current_state = 0  # INACTIVE
-            temperature = 0
-        # the 'Active' element is 'ACTIVE'
-        else:
-            # 'AUTO' in 'TargetHeaterCoolerState'
-            if target_heater_cooler_state == 0:
-                selected_code = "aircon_dehumidify-auto-auto"
-                current_state = 1  # IDLE
-                temperature = 25
-            # 'HEAT' in 'TargetHeaterCoolerState'
-            elif target_heater_cooler_state == 1:
-                current_state = 2  # HEATING
-                if heating_threshold_temperature >= 25:
-                    selected_code = "aircon_warm-26-full-swing"
-                    temperature = 25
-                elif heating_threshold_temperature >= 23:
-                    selected_code = "aircon_warm-24-auto"
-                    temperature = 24
-                elif heating_threshold_temperature >= 21:
-                    selected_code = "aircon_warm-22-auto"
-                    temperature = 22
-                elif heating_threshold_temperature >= 19:
-                    selected_code = "aircon_warm-20-auto"
-                    temperature = 20
-                else:
-                    selected_code = "aircon_warm-18-auto"
-                    temperature = 18
-            # 'COOL' in 'TargetHeaterCoolerState'
-            elif target_heater_cooler_state == 2:
-                selected_code = "aircon_cool-26-auto"
-                current_state = 3  # COOLING
-                temperature = 26
-
-        LOGGER.debug(f"END: {selected_code}, {current_state}, {temperature}")
-        return selected_code, current_state, temperature
-
+        if "id" in message:
+            stats["id"] = message["id"]
+        writer.write(stats)
+
+    def __reply_history(self, message, writer):
+        step, points = 0, []
+        if self.__history is not None:
+            end = message.get("end", time())
+            step, points = self.__history.query(message["name"], message["characteristic"],
+                                                message.get("start", end - HISTORY_RANGE), end)
+        history = {
+            "method": "HISTORY",
+            "name": message["name"],
+            "characteristic": message["characteristic"],
+            "step": step,
+            "points": points,
+        }
+        if "id" in message:
+            history["id"] = message["id"]
+        writer.write(history)
 
     def send(self, message):
-        self.__lock.acquire()
-        text = json.dumps(message)
-        LOGGER.info(f"send: {text}")
-        sys.stdout.write(text + "\n")
-        sys.stdout.flush()
-        self.__lock.release()
+        """Send ``message`` to all the clients.
+        """
+        # the writers of the asyncio mode are written on the event loop only, e.g., not on the thread of a sensor.
+        if self.__event_loop is not None and get_ident() != self.__event_loop_thread:
+            try:
+                self.__event_loop.call_soon_threadsafe(self.send, message)
+            except RuntimeError:
+                LOGGER.info("Not sent the message after the event loop closed: %s", message)
+            return
+
+        with self.__clients_condition:
+            writers = list(self.__clients)
+        for writer in writers:
+            writer.write(message)
+
+        if not isinstance(message, SetMessage):
+            return
+        self.__state_cache.update(message.name, {message.characteristic: message.value})
+        # keep the last values to publish them after the restart.
+        if self.__snapshot is not None:
+            self.__snapshot.update("reports", message.name, {message.characteristic: message.value})
 
 
 if __name__ == "__main__":
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+
+# Copyright (c) 2023 Patineboot. All rights reserved.
+# IrCodeTable is licensed under CC BY-NC-ND 4.0.
+
+# Attribution-NonCommercial-NoDerivatives 4.0 International
+
+# Under the following terms:
+# Attribution — You must give appropriate credit, provide a
+# link to the license, and indicate if changes were made. You
+# may do so in any reasonable manner, but not in any way that
+# suggests the licensor endorses you or your use.
+# NonCommercial — You may not use the material for
+# commercial purposes.
+# NoDerivatives — If you remix, transform, or build upon the
+# material, you may not distribute the modified material.
+# No additional restrictions — You may not apply legal terms
+# or technological measures that legally restrict others from
+# doing anything the license permits.
+
+# Notices:
+# You do not have to comply with the license for elements of
+# the material in the public domain or where your use is
+# permitted by an applicable exception or limitation.
+
+# No warranties are given. The license may not give you all of
+# the permissions necessary for your intended use. For
+# example, other rights such as publicity, privacy, or moral
+# rights may limit how you use the material.
+
+import os
+import json
+import struct
+from threading import Lock
+
+from multilogger import traced
+
+######################
+#    Script Code     #
+######################
+LOGGER = None
+
+
+class IrCodeTable:
+    """IrCodeTable class.
+
+    The IrCodeTable class holds the infrared codes of the codes json file of cgir.
+    - Load the codes once and index them by the code name.
+    - Pre-convert each code into the pulse data to write to the LIRC device.
+    - Reload the codes in place when the modified time of the file changes.
+    """
+
+    @traced
+    def __init__(self, logger, path):
+        """Create an infrared code table loaded from ``path``.
+        Args:
+            logger: The logger.
+            path: The path of the infrared codes json file of cgir.
+        """
+        super().__init__()
+        global LOGGER
+        LOGGER = logger
+
+        self.__path = path
+        self.__mtime = None
+        self.__pulses = {}
+        self.__required = frozenset()
+        self.__lock = Lock()
+
+        self.__load()
+
+    def get_path(self):
+        return self.__path
+
+    def get_names(self):
+        return frozenset(self.__pulses)
+
+    def get(self, name):
+        """Get the pulse data of the infrared code named ``name``.
+        Args:
+            name: The name of the infrared code.
+        Returns:
+            The bytes to write to the LIRC device, None if the table has not the code.
+        """
+        self.reload()
+        return self.__pulses.get(name)
+
+    @traced
+    def require(self, names):
+        """Verify the table has all the infrared codes of ``names``.
+        The later reloads keep the current codes if the new file misses any of them.
+        Args:
+            names: The names of the infrared codes.
+        Raises:
+            ValueError: The table misses some infrared codes.
+        """
+        missing = sorted(set(names) - set(self.__pulses))
+        if missing:
+            raise ValueError(f"Not found the infrared codes in {self.__path}: {', '.join(missing)}")
+        self.__required = frozenset(names)
+
+    def reload(self):
+        """Reload the codes if the modified time of the file changed.
+        """
+        try:
+            mtime = os.stat(self.__path).st_mtime_ns
+        except OSError:
+            return
+        if mtime == self.__mtime:
+            return
+
+        with self.__lock:
+            if mtime != self.__mtime:
+                try:
+                    self.__load()
+                except (OSError, ValueError) as error:
+                    # keep the current codes and try again on the next modification.
+                    self.__mtime = mtime
+                    LOGGER.error(f"Failed to reload {self.__path}: {error}")
+
+    def __load(self):
+        mtime = os.stat(self.__path).st_mtime_ns
+        with open(self.__path, "r") as file:
+            codes = json.load(file)
+
+        pulses = {}
+        for name, code in codes.items():
+            pulses[name] = self.__compile(code)
+
+        missing = sorted(self.__required - set(pulses))
+        if missing:
+            raise ValueError(f"missing the infrared codes: {', '.join(missing)}")
+
+        # replace the table at once, a reader gets either the old or new one.
+        self.__pulses = pulses
+        self.__mtime = mtime
+        LOGGER.info(f"Infrared codes: loaded {len(pulses)} codes from {self.__path}")
+
+    @staticmethod
+    def __compile(code):
+        # the same pulse data as cgir's Infrared.code2lirc_data, 32-bit little endian durations.
+        return struct.pack(f"<{len(code)}I", *code)
+
+
+if __name__ == "__main__":
+    print("IrCodeTable is an Import Module.")
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+
+# Copyright (c) 2023 Patineboot. All rights reserved.
+# IrTransmitter is licensed under CC BY-NC-ND 4.0.
+
+# Attribution-NonCommercial-NoDerivatives 4.0 International
+
+# Under the following terms:
+# Attribution — You must give appropriate credit, provide a
+# link to the license, and indicate if changes were made. You
+# may do so in any reasonable manner, but not in any way that
+# suggests the licensor endorses you or your use.
+# NonCommercial — You may not use the material for
+# commercial purposes.
+# NoDerivatives — If you remix, transform, or build upon the
+# material, you may not distribute the modified material.
+# No additional restrictions — You may not apply legal terms
+# or technological measures that legally restrict others from
+# doing anything the license permits.
+
+# Notices:
+# You do not have to comply with the license for elements of
+# the material in the public domain or where your use is
+# permitted by an applicable exception or limitation.
+
+# No warranties are given. The license may not give you all of
+# the permissions necessary for your intended use. For
+# example, other rights such as publicity, privacy, or moral
+# rights may limit how you use the material.
+
+import os
+import subprocess
+from threading import Lock
+
+from multilogger import traced
+
+######################
+#      Configure     #
+######################
+# The LIRC device of the infrared LED on the infrared HAT.
+INFRARED_SEND_DEVICE = "/dev/lirc0"
+# The carrier frequency of the infrared codes in Hz.
+INFRARED_CARRIER_FREQUENCY = 38000
+# The command of Infrared sending used as the fallback, the options of cgir precede the send subcommand.
+SEND_INFRARED_COMMAND = "cgir"
+
+######################
+#    Script Code     #
+######################
+LOGGER = None
+
+# cgir is imported on opening the in-process driver, False if it is not importable.
+cgir = None
+
+
+class IrTransmitter:
+    """IrTransmitter class.
+
+    The IrTransmitter class is a long-lived engine to send infrared codes.
+    - Keep the LIRC device of the infrared LED open and write the codes to it in process.
+    - Fall back to the cgir command if the in-process driver is not available.
+    """
+
+    @traced
+    def __init__(self, logger, code_table, device=INFRARED_SEND_DEVICE):
+        """Create an infrared transmitter.
+        Args:
+            logger: The logger.
+            code_table: The IrCodeTable of the infrared codes json file of cgir.
+            device: The LIRC device file of the infrared LED.
+        """
+        super().__init__()
+        global LOGGER
+        LOGGER = logger
+
+        self.__code_table = code_table
+        self.__device = device
+        self.__fd = None
+        self.__lock = Lock()
+        # the worker to wait for the LIRC driver out of the event loop.
+        self.__executor = None
+
+    @traced
+    def open(self):
+        """Open the in-process driver.
+        Returns:
+            True if the in-process driver is ready, otherwise False and the fallback command is used.
+        """
+        with self.__lock:
+            opened = self.__open()
+
+        return opened
+
+    @traced
+    def close(self):
+        with self.__lock:
+            self.__close()
+
+        if self.__executor is not None:
+            self.__executor.shutdown(wait=False)
+            self.__executor = None
+
+    @traced
+    def transmit(self, infrared_code):
+        """Send the infrared code named ``infrared_code``.
+        Args:
+            infrared_code: The name of the infrared code on the codes json file.
+        """
+        with self.__lock:
+            sent = self.__transmit_driver(infrared_code)
+            if not sent:
+                self.__send_command(infrared_code)
+
+    @traced
+    def transmit_many(self, infrared_codes):
+        """Send the infrared codes named ``infrared_codes`` back-to-back in one session of the driver.
+        Args:
+            infrared_codes: The list of the names of the infrared codes on the codes json file.
+        """
+        with self.__lock:
+            for infrared_code in infrared_codes:
+                sent = self.__transmit_driver(infrared_code)
+                if not sent:
+                    self.__send_command(infrared_code)
+
+    @traced
+    async def transmit_async(self, infrared_code):
+        """Send the infrared code named ``infrared_code`` without blocking the event loop.
+        Args:
+            infrared_code: The name of the infrared code on the codes json file.
+        """
+        import asyncio
+        from concurrent.futures import ThreadPoolExecutor
+
+        sent = False
+        if self.__import_cgir():
+            if self.__executor is None:
+                self.__executor = ThreadPoolExecutor(max_workers=1)
+            loop = asyncio.get_event_loop()
+            sent = await loop.run_in_executor(self.__executor, self.__transmit_locked, infrared_code)
+        if not sent:
+            await self.__send_command_async(infrared_code)
+
+    @traced
+    async def transmit_many_async(self, infrared_codes):
+        """Send the infrared codes named ``infrared_codes`` back-to-back without blocking the event loop.
+        Args:
+            infrared_codes: The list of the names of the infrared codes on the codes json file.
+        """
+        import asyncio
+        from concurrent.futures import ThreadPoolExecutor
+
+        unsent = list(infrared_codes)
+        if self.__import_cgir():
+            if self.__executor is None:
+                self.__executor = ThreadPoolExecutor(max_workers=1)
+            loop = asyncio.get_event_loop()
+            unsent = await loop.run_in_executor(self.__executor, self.__transmit_many_locked, infrared_codes)
+        for infrared_code in unsent:
+            await self.__send_command_async(infrared_code)
+
+    def __transmit_many_locked(self, infrared_codes):
+        # the codes the driver failed to send, to send with the command.
+        with self.__lock:
+            return [infrared_code for infrared_code in infrared_codes
+                    if not self.__transmit_driver(infrared_code)]
+
+    def __transmit_locked(self, infrared_code):
+        with self.__lock:
+            return self.__transmit_driver(infrared_code)
+
+    def __transmit_driver(self, infrared_code):
+        # open the driver again if a previous failure closed it.
+        if self.__fd is None:
+            self.__open()
+
+        if self.__fd is None:
+            return False
+        return self.__write(infrared_code)
+
+    def __open(self):
+        if self.__fd is not None:
+            return True
+
+        if not self.__import_cgir():
+            LOGGER.info(f"cgir is not importable, use the command: {SEND_INFRARED_COMMAND}")
+            return False
+
+        try:
+            # not create the device file if it does not exist.
+            fd = os.fdopen(os.open(self.__device, os.O_WRONLY), "wb", buffering=0)
+        except OSError as error:
+            LOGGER.warning(f"Not open the in-process driver: {error}")
+            return False
+
+        try:
+            # configure the device once instead of every sending.
+            infrared = cgir.Infrared
+            features = infrared.lirc_get_features(fd)
+            if not infrared.lirc_can_send_pulse(features):
+                raise OSError(f"{self.__device} does not support the pulse mode")
+            infrared.lirc_set_send_carrier(fd, INFRARED_CARRIER_FREQUENCY)
+            infrared.lirc_set_send_mode(fd, cgir.LIRC_MODE_PULSE)
+        except (OSError, AttributeError) as error:
+            LOGGER.warning(f"Not open the in-process driver: {error}")
+            fd.close()
+            return False
+
+        self.__fd = fd
+        LOGGER.info(f"Infrared: opened {self.__device}")
+        return True
+
+    def __import_cgir(self):
+        # the dry run and the test mode never load the hardware library.
+        global cgir
+        if cgir is None:
+            try:
+                import cgir
+            except ImportError:
+                cgir = False
+        return cgir is not False
+
+    def __close(self):
+        if self.__fd is None:
+            return
+        self.__fd.close()
+        self.__fd = None
+
+    def __write(self, infrared_code):
+        pulses = self.__code_table.get(infrared_code)
+        if pulses is None:
+            LOGGER.error(f"Not found the infrared code: {infrared_code}")
+            return False
+
+        LOGGER.info("Infrared: %s %s", self.__device, infrared_code)
+        try:
+            # the LIRC driver returns after emitting the whole pulse train.
+            self.__fd.write(pulses)
+        except OSError as error:
+            LOGGER.error(f"Failed to write the infrared code: {infrared_code}, {error}")
+            self.__close()
+            return False
+        return True
+
+    def __make_command(self, infrared_code):
+        # the command sends out of the LIRC device of the transmitter, not the default one of cgir.
+        send_command_line = f"{SEND_INFRARED_COMMAND} -c {self.__code_table.get_path()} -t {self.__device} " \
+                            f"send {infrared_code}"
+        LOGGER.info("Infrared: %s", send_command_line)
+        return send_command_line.split()
+
+    def __send_command(self, infrared_code):
+        send_command = self.__make_command(infrared_code)
+        process = subprocess.run(send_command, text=True, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        if process.returncode != 0:
+            LOGGER.error(f"command line: {send_command}")
+            LOGGER.error(f"error code: {process.returncode}")
+            LOGGER.error(f"error message: {process.stdout}")
+            process.check_returncode()
+
+    async def __send_command_async(self, infrared_code):
+        import asyncio
+
+        send_command = self.__make_command(infrared_code)
+        process = await asyncio.create_subprocess_exec(
+            *send_command, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT)
+        stdout, _ = await process.communicate()
+        if process.returncode != 0:
+            LOGGER.error(f"command line: {send_command}")
+            LOGGER.error(f"error code: {process.returncode}")
+            LOGGER.error(f"error message: {stdout.decode()}")
+            raise subprocess.CalledProcessError(process.returncode, send_command, stdout.decode())
+
+
+if __name__ == "__main__":
+    print("IrTransmitter is an Import Module.")
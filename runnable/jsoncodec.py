@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+
+# Copyright (c) 2023 Patineboot. All rights reserved.
+# JsonCodec is licensed under CC BY-NC-ND 4.0.
+
+# Attribution-NonCommercial-NoDerivatives 4.0 International
+
+# Under the following terms:
+# Attribution — You must give appropriate credit, provide a
+# link to the license, and indicate if changes were made. You
+# may do so in any reasonable manner, but not in any way that
+# suggests the licensor endorses you or your use.
+# NonCommercial — You may not use the material for
+# commercial purposes.
+# NoDerivatives — If you remix, transform, or build upon the
+# material, you may not distribute the modified material.
+# No additional restrictions — You may not apply legal terms
+# or technological measures that legally restrict others from
+# doing anything the license permits.
+
+# Notices:
+# You do not have to comply with the license for elements of
+# the material in the public domain or where your use is
+# permitted by an applicable exception or limitation.
+
+# No warranties are given. The license may not give you all of
+# the permissions necessary for your intended use. For
+# example, other rights such as publicity, privacy, or moral
+# rights may limit how you use the material.
+
+import json
+from importlib import import_module
+
+from multilogger import traced
+
+######################
+#    Script Code     #
+######################
+LOGGER = None
+
+# the codec names in the preferred order of the 'auto' codec.
+CODEC_NAMES = ["orjson", "ujson", "json"]
+
+
+class JsonCodec:
+    """JsonCodec class.
+
+    The JsonCodec class encodes and decodes the JSON messages on the standard input and output.
+    - Use the fastest JSON library installed with the 'auto' name, the stdlib json at least.
+    - Import the JSON library of the codec only, not all the candidates.
+    - Encode a message into the bytes of a line, or a value into the bytes of a part of a message.
+    """
+
+    @traced
+    def __init__(self, logger, name="auto"):
+        """Create a JSON codec.
+        Args:
+            logger: The logger.
+            name: 'auto', 'orjson', 'ujson' or 'json'.
+        Raises:
+            ValueError: The JSON library of ``name`` is not installed.
+        """
+        super().__init__()
+        global LOGGER
+        LOGGER = logger
+
+        if name not in CODEC_NAMES and name != "auto":
+            raise ValueError(f"Unknown JSON codec: {name}")
+
+        library = None
+        for candidate in (CODEC_NAMES if name == "auto" else [name]):
+            try:
+                library = import_module(candidate)
+            except ImportError:
+                continue
+            name = candidate
+            break
+        if library is None:
+            raise ValueError(f"The JSON codec is not installed: {name}")
+
+        self.name = name
+        self.decode = library.loads
+        if name == "orjson":
+            dumps = library.dumps
+            self.encode = lambda message: dumps(message) + b"\n"
+            self.encode_value = dumps
+        elif name == "ujson":
+            dumps = library.dumps
+            self.encode = lambda message: (dumps(message, ensure_ascii=False) + "\n").encode()
+            self.encode_value = lambda value: dumps(value, ensure_ascii=False).encode()
+        else:
+            self.encode = self.__encode_json
+            self.encode_value = self.__encode_value_json
+
+        LOGGER.info(f"JSON codec: {name}")
+
+    @staticmethod
+    def __encode_json(message):
+        return (json.dumps(message) + "\n").encode()
+
+    @staticmethod
+    def __encode_value_json(value):
+        return json.dumps(value).encode()
+
+
+if __name__ == "__main__":
+    print("JsonCodec is an Import Module.")
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+
+# Copyright (c) 2023 Patineboot. All rights reserved.
+# MessageWriter is licensed under CC BY-NC-ND 4.0.
+
+# Attribution-NonCommercial-NoDerivatives 4.0 International
+
+# Under the following terms:
+# Attribution — You must give appropriate credit, provide a
+# link to the license, and indicate if changes were made. You
+# may do so in any reasonable manner, but not in any way that
+# suggests the licensor endorses you or your use.
+# NonCommercial — You may not use the material for
+# commercial purposes.
+# NoDerivatives — If you remix, transform, or build upon the
+# material, you may not distribute the modified material.
+# No additional restrictions — You may not apply legal terms
+# or technological measures that legally restrict others from
+# doing anything the license permits.
+
+# Notices:
+# You do not have to comply with the license for elements of
+# the material in the public domain or where your use is
+# permitted by an applicable exception or limitation.
+
+# No warranties are given. The license may not give you all of
+# the permissions necessary for your intended use. For
+# example, other rights such as publicity, privacy, or moral
+# rights may limit how you use the material.
+
+import sys
+import queue
+import logging
+from threading import Thread
+
+from multilogger import traced
+
+######################
+#      Configure     #
+######################
+# the number of the encoded messages waiting for the writer.
+WRITER_QUEUE_SIZE = 256
+# the number of the messages written with a flush at most.
+WRITER_BATCH_SIZE = 64
+
+######################
+#    Script Code     #
+######################
+LOGGER = None
+
+
+class MessageWriter:
+    """MessageWriter class.
+
+    The MessageWriter class writes the messages to the standard output on a dedicated writer.
+    - Encode a message with the codec when it is sent, so the sender may change it afterward.
+    - Write the bytes of the messages ready to write with a single flush.
+    - Block the sender while the bounded queue is full, or give up the stalled reader without blocking.
+    - Let the sender on the event loop wait for the writer task with ``drain_async`` instead of blocking the loop.
+    - Discard the messages after the stream is broken, so the sender never blocks on a closed reader.
+    """
+
+    @traced
+    def __init__(self, logger, codec, stream=None, maxsize=WRITER_QUEUE_SIZE, overflow=None):
+        """Create a message writer.
+        Args:
+            logger: The logger.
+            codec: The JsonCodec to encode the messages.
+            stream: The binary stream to write the messages, the standard output if None.
+            maxsize: The number of the encoded messages waiting for the writer.
+            overflow: The function called once the queue is full, the messages are discarded from then,
+                None blocks the sender while the queue is full.
+        """
+        super().__init__()
+        global LOGGER
+        LOGGER = logger
+
+        self.__codec = codec
+        self.__stream = stream if stream is not None else sys.stdout.buffer
+        self.__maxsize = maxsize
+        self.__overflow = overflow
+        self.__queue = queue.Queue(maxsize)
+        self.__async_queue = None
+        # the event of the writer task taking the queued messages, asyncio is imported on running the task.
+        self.__async_taken = None
+        self.__thread = None
+        self.__broken = False
+
+    def start(self):
+        """Start the writer thread.
+        """
+        thread = Thread(target=self.__run)
+        thread.start()
+        self.__thread = thread
+        return thread
+
+    def stop(self):
+        """Stop the writer thread after writing the queued messages.
+        """
+        if self.__thread is None:
+            return
+        self.__queue.put(None)
+        self.__thread.join()
+        self.__thread = None
+
+    def write(self, message):
+        """Queue ``message`` to write.
+        """
+        if self.__broken:
+            return
+
+        # a typed message encodes itself with the pre-encoded parts of it.
+        data = self.__codec.encode(message) if isinstance(message, dict) else message.encode(self.__codec)
+        if LOGGER.isEnabledFor(logging.INFO):
+            LOGGER.info("send: %s", data.decode(errors="replace").rstrip())
+
+        if self.__async_queue is None:
+            if self.__overflow is None:
+                self.__queue.put(data)
+                return
+            try:
+                self.__queue.put_nowait(data)
+            except queue.Full:
+                # the reader not reading the messages never blocks the sender shared with the other readers.
+                LOGGER.warning(f"Not write the messages to the stalled reader, {self.__maxsize} messages are waiting")
+                self.__broken = True
+                self.__overflow()
+            return
+
+        # the queue of the writer task keeps the order of the messages, the sender waits with drain_async.
+        self.__async_queue.put_nowait(data)
+
+    def is_broken(self):
+        """Check the stream failed to write and the messages are discarded.
+        """
+        return self.__broken
+
+    def qsize(self):
+        """Get the number of the messages waiting for the writer.
+        """
+        if self.__async_queue is not None:
+            return self.__async_queue.qsize()
+        return self.__queue.qsize()
+
+    @traced
+    async def run_async(self):
+        """Run the writer as a task on the event loop.
+        """
+        import asyncio
+
+        self.__async_taken = asyncio.Event()
+        self.__async_queue = asyncio.Queue()
+        try:
+            while True:
+                chunks = [await self.__async_queue.get()]
+                # coalesce the messages ready to write into one flush.
+                while len(chunks) < WRITER_BATCH_SIZE and not self.__async_queue.empty():
+                    chunks.append(self.__async_queue.get_nowait())
+                self.__async_taken.set()
+                self.__flush(chunks)
+                for _ in chunks:
+                    self.__async_queue.task_done()
+        finally:
+            self.__async_queue = None
+
+    async def drain_async(self):
+        """Wait on the event loop while ``maxsize`` messages are waiting for the writer task.
+        """
+        while self.__async_queue is not None and self.__async_queue.qsize() >= self.__maxsize:
+            self.__async_taken.clear()
+            await self.__async_taken.wait()
+
+    async def join_async(self):
+        """Wait for writing the queued messages on the event loop.
+        """
+        if self.__async_queue is not None:
+            await self.__async_queue.join()
+
+    @traced
+    def __run(self):
+        closed = False
+        while not closed:
+            data = self.__queue.get()
+            if data is None:
+                break
+            chunks = [data]
+            # coalesce the messages ready to write into one flush.
+            while len(chunks) < WRITER_BATCH_SIZE:
+                try:
+                    data = self.__queue.get_nowait()
+                except queue.Empty:
+                    break
+                if data is None:
+                    closed = True
+                    break
+                chunks.append(data)
+            self.__flush(chunks)
+
+    def __flush(self, chunks):
+        if self.__broken:
+            return
+        try:
+            self.__stream.write(b"".join(chunks))
+            self.__stream.flush()
+        except OSError as error:
+            LOGGER.warning(f"Not write the messages: {error}")
+            self.__broken = True
+
+
+if __name__ == "__main__":
+    print("MessageWriter is an Import Module.")
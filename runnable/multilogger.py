@@ -32,8 +32,16 @@
 # from typing import Final
 
 import sys
+import queue
+import atexit
 import logging
+import functools
 from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler
+from logging.handlers import QueueListener
+
+# the flag of the code of a coroutine function, inspect.CO_COROUTINE without importing inspect.
+CO_COROUTINE = 0x80
 
 # LOGGER_LOG_LEVEL: Final[int] = logging.DEBUG
 LOGGER_LOG_LEVEL = logging.DEBUG
@@ -52,6 +60,8 @@ class MultiLogger(logging.getLoggerClass()):
         self.__logger = logger
         self.__stdout_handler = None
         self.__logfile_handler = None
+        self.__queue_handler = None
+        self.__listener = None
 
     def enable_stouthandler(self):
 
@@ -66,9 +76,10 @@ class MultiLogger(logging.getLoggerClass()):
         stdout_handler = logging.StreamHandler(sys.stdout)
         stdout_handler.setFormatter(stout_formatter)
         stdout_handler.setLevel(logging.WARN)
-        self.__logger.addHandler(stdout_handler)
+        self.__add_handler(stdout_handler)
 
         self.__stdout_handler = stdout_handler
+        self.__update_level()
 
     def enable_filehandler(self, filename):
 
@@ -84,9 +95,46 @@ class MultiLogger(logging.getLoggerClass()):
         logfile_handler = RotatingFileHandler(log_filename, maxBytes=(1048576 * 5), backupCount=2)
         logfile_handler.setFormatter(logfile_formatter)
         logfile_handler.setLevel(logging.INFO)
-        self.__logger.addHandler(logfile_handler)
+        self.__add_handler(logfile_handler)
 
         self.__logfile_handler = logfile_handler
+        self.__update_level()
+
+    def enable_background(self):
+        """Move the handlers to a background thread.
+        The logging thread only enqueues the records, and the background thread
+        formats and writes them, so the thread does not wait for the log file.
+        """
+        if self.__listener:
+            self.warning("background is already enabled.")
+            return
+
+        handlers = [handler for handler in (self.__stdout_handler, self.__logfile_handler) if handler]
+        for handler in handlers:
+            self.__logger.removeHandler(handler)
+
+        records = queue.Queue()
+        self.__queue_handler = QueueHandler(records)
+        self.__logger.addHandler(self.__queue_handler)
+
+        self.__listener = QueueListener(records, *handlers, respect_handler_level=True)
+        self.__listener.start()
+        # write the queued records before exiting.
+        atexit.register(self.disable_background)
+
+    def disable_background(self):
+        """Write the queued records and move the handlers back to the logging thread.
+        """
+        if not self.__listener:
+            return
+
+        self.__listener.stop()
+        self.__logger.removeHandler(self.__queue_handler)
+        for handler in self.__listener.handlers:
+            self.__logger.addHandler(handler)
+
+        self.__listener = None
+        self.__queue_handler = None
 
     def set_verbose(self):
         if self.__stdout_handler is not None:
@@ -95,6 +143,21 @@ class MultiLogger(logging.getLoggerClass()):
         if self.__logfile_handler is not None:
             self.__logfile_handler.setLevel(logging.DEBUG)
 
+        self.__update_level()
+
+    def __add_handler(self, handler):
+        # the background thread writes the records to the handler if enabled.
+        if self.__listener:
+            self.__listener.handlers = self.__listener.handlers + (handler,)
+        else:
+            self.__logger.addHandler(handler)
+
+    def __update_level(self):
+        # skip the records no handler writes at the first check of the logging methods.
+        levels = [handler.level for handler in (self.__stdout_handler, self.__logfile_handler) if handler]
+        if levels:
+            self.__logger.setLevel(min(levels))
+
     def set_simple_stdout(self):
         formatter = logging.Formatter("%(message)s")
         self.__stdout_handler.setFormatter(formatter)
@@ -105,3 +168,44 @@ class MultiLogger(logging.getLoggerClass()):
             message: the message to notice to the user.
         """
         self.__logger.log(100, message)
+
+
+def traced(function):
+    """Trace the calls of ``function`` to the ``LOGGER`` of its module at the DEBUG level.
+    The arguments and the result are formatted only if the DEBUG level is enabled,
+    so the traced function runs as it is otherwise.
+    """
+    module = function.__globals__
+    code = function.__code__
+    # not trace the instance of the methods.
+    skip = 1 if code.co_varnames[:1] == ("self",) else 0
+
+    def trace(logger, message, args):
+        record = logger.makeRecord(logger.name, logging.DEBUG, code.co_filename, code.co_firstlineno,
+                                   message, args, None, func=function.__name__)
+        logger.handle(record)
+
+    if code.co_flags & CO_COROUTINE:
+        @functools.wraps(function)
+        async def async_wrapper(*args, **kwargs):
+            logger = module.get("LOGGER")
+            if logger is None or not logger.isEnabledFor(logging.DEBUG):
+                return await function(*args, **kwargs)
+
+            trace(logger, "STR: %s %s", (args[skip:], kwargs))
+            result = await function(*args, **kwargs)
+            trace(logger, "END: %s", (result,))
+            return result
+        return async_wrapper
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        logger = module.get("LOGGER")
+        if logger is None or not logger.isEnabledFor(logging.DEBUG):
+            return function(*args, **kwargs)
+
+        trace(logger, "STR: %s %s", (args[skip:], kwargs))
+        result = function(*args, **kwargs)
+        trace(logger, "END: %s", (result,))
+        return result
+    return wrapper
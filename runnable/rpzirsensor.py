@@ -29,11 +29,19 @@
 # rights may limit how you use the material.
 
 import os
-import subprocess
-from time import sleep
+from time import perf_counter
 from threading import Thread
 
-import cgsensor
+from ircodetable import IrCodeTable
+from irtransmitter import IrTransmitter
+from irtransmitter import INFRARED_SEND_DEVICE
+from devicerules import DEFAULT_TRANSMITTER
+from sensorscheduler import SensorScheduler
+from sensorscheduler import DEFAULT_SENSORS
+from circuitbreaker import CircuitBreaker
+from circuitbreaker import CircuitOpenError
+from runnablemessage import SetMessage
+from multilogger import traced
 
 ######################
 #      Configure     #
@@ -43,8 +51,6 @@ import cgsensor
 SCRIPT_DIRECTORY = os.path.dirname(__file__)
 # infrared codes json file.
 CGIRTOOL_CODE_JSON = os.path.join(SCRIPT_DIRECTORY, "codes.json")
-# The command of Infrared sending
-SEND_INFRARED_COMMAND = "cgir send" + " -c " + CGIRTOOL_CODE_JSON
 
 ######################
 #    Script Code     #
@@ -53,18 +59,75 @@ LOGGER = None
 
 
 class RpzIrSensor:
-    def __init__(self, logger, dryrun, sender):
+    @traced
+    def __init__(self, logger, dryrun, sender, metrics=None, transmitters=None, transmitter_factory=None,
+                 sensor_devices=None, policy=None, state_cache=None, history=None, sensors=None):
+        """Create the infrared transmitter and the sensors of the infrared HAT.
+        Args:
+            logger: The logger.
+            dryrun: Not send the infrared codes if True.
+            sender: The object to send the messages of the sensor readings.
+            metrics: The RunnableMetrics to measure the infrared sends and the sensor polls.
+            transmitters: The dictionary of the transmitter name to the LIRC device,
+                the default transmitter of the infrared HAT if None.
+            transmitter_factory: The function to create a transmitter,
+                ``transmitter_factory(logger, code_table, device)``, IrTransmitter if None.
+            sensor_devices: The dictionary of the sensor type to the device replacing the hardware,
+                e.g., ``{"bme280": FakeBME280()}``, the sensors on the HAT if None.
+            policy: The SensorPolicy to report the readings of all the sensors,
+                the policy of each sensor from its description if None.
+            state_cache: The StateCache to keep every reading, reported or not.
+            history: The SensorHistory to record every reading, not recorded if None.
+            sensors: The dictionary of the sensor name to the description of the sensor, the BME280 on the HAT if None.
+        A circuit breaker of each transmitter fails the infrared codes fast while the transmitter is unhealthy.
+        """
         super().__init__()
         global LOGGER
         LOGGER = logger
 
-        LOGGER.debug(f"STR")
-
         self.__dryrun = dryrun
         self.__sender = sender
-        self.__stopped = True
+        self.__metrics = metrics
+        self.__state_cache = state_cache
+        self.__history = history
+        self.__sensors = SensorScheduler(logger, sensors if sensors is not None else DEFAULT_SENSORS, self.__report,
+                                         metrics, sensor_devices, policy)
+
+        # load the infrared codes once and keep the transmitters warm across flashes.
+        self.__code_table = IrCodeTable(logger, CGIRTOOL_CODE_JSON)
+        if transmitters is None:
+            transmitters = {DEFAULT_TRANSMITTER: None}
+        if transmitter_factory is None:
+            transmitter_factory = IrTransmitter
+        self.__transmitters = {}
+        for name, device in transmitters.items():
+            transmitter = transmitter_factory(logger, self.__code_table, device or INFRARED_SEND_DEVICE)
+            if not dryrun:
+                transmitter.open()
+            self.__transmitters[name] = transmitter
+        self.__breakers = {name: CircuitBreaker(logger, f"transmitter {name}") for name in self.__transmitters}
+        if metrics is not None:
+            metrics.register_gauge("circuits_open",
+                                   lambda: sum(breaker.is_open() for breaker in self.__breakers.values()))
+
+    def require_codes(self, infrared_codes):
+        """Verify the codes json file has all ``infrared_codes``.
+        Raises:
+            ValueError: The codes json file misses some infrared codes.
+        """
+        self.__code_table.require(infrared_codes)
 
-        LOGGER.debug(f"END")
+    def is_sensor(self, name):
+        """Check the accessory ``name`` is a reading of a sensor.
+        """
+        return self.__sensors.is_sensor(name)
+
+    def refresh(self, name=None):
+        """Read the sensors reporting the accessory ``name`` now and update the state cache, all the sensors if None.
+        The callers during a reading in progress wait for it and share the values,
+        so concurrent callers trigger one reading of a sensor.
+        """
+        self.__sensors.refresh(name)
 
     def start(self):
         thread = Thread(target=self.run)
@@ -72,55 +135,125 @@ class RpzIrSensor:
         return thread
 
     def stop(self):
-        self.__stopped = True
+        self.__sensors.stop()
 
+    @traced
     def run(self):
-        LOGGER.debug(f"STR")
-        self.__stopped = False
-
-        bme280 = cgsensor.BME280(i2c_addr=0x76)
+        self.__sensors.run()
 
-        while not self.__stopped:
-            bme280.forced()
-            humidity_message = self.__make_message("Bikini Humidity", "CurrentRelativeHumidity", bme280.humidity)
-            self.__sender.send(humidity_message)
+    @traced
+    async def run_async(self):
+        """Run the sensor polling as a task on the event loop.
+        """
+        await self.__sensors.run_async()
 
-            temperature_message = self.__make_message("Bikini Temperature", "CurrentTemperature", bme280.temperature)
-            self.__sender.send(temperature_message)
+    def __report(self, name, characteristic, value, policy):
+        if self.__state_cache is not None:
+            self.__state_cache.update(name, {characteristic: value})
+        if self.__history is not None:
+            self.__history.record(name, characteristic, value)
+        # not report the value within the deadband of the last reported one.
+        if not policy.should_report(name, characteristic, value):
+            return
+        message = self.__make_message(name, characteristic, value)
+        self.__sender.send(message)
 
-            sleep(10)
+    def __make_message(self, name, characteristic, value):
+        # the message of the fixed shape is encoded with the pre-encoded head of the names.
+        return SetMessage(name, characteristic, value)
 
-        LOGGER.debug(f"END")
+    @traced
+    def flash(self, infrared_code, transmitter=DEFAULT_TRANSMITTER):
+        if infrared_code is None:
+            LOGGER.warn(f"Not found any infrared codes")
 
-    def __make_message(self, name, characteristic, value):
-        message = {
-            "method": "SET",
-            "name": name,
-            "characteristic": characteristic,
-            "value": value
-        }
-        return message
+        if self.__dryrun:
+            LOGGER.info("Infrared: %s (dry run)", infrared_code)
+            return
 
-    def flash(self, infrared_code):
-        LOGGER.debug(f"STR: {infrared_code}")
+        breaker = self.__check_circuit(transmitter)
+        started = perf_counter()
+        try:
+            self.__transmitters[transmitter].transmit(infrared_code)
+        except Exception:
+            breaker.fail()
+            self.__count_flash("ir_failures", started)
+            raise
+        breaker.succeed()
+        self.__count_flash("ir_sends", started)
 
+    @traced
+    async def flash_async(self, infrared_code, transmitter=DEFAULT_TRANSMITTER):
         if infrared_code is None:
             LOGGER.warn(f"Not found any infrared codes")
 
-        send_command_line = f"{SEND_INFRARED_COMMAND} {infrared_code}"
-        LOGGER.info(f"Infrared: {send_command_line}")
         if self.__dryrun:
+            LOGGER.info("Infrared: %s (dry run)", infrared_code)
+            return
+
+        breaker = self.__check_circuit(transmitter)
+        started = perf_counter()
+        try:
+            await self.__transmitters[transmitter].transmit_async(infrared_code)
+        except Exception:
+            breaker.fail()
+            self.__count_flash("ir_failures", started)
+            raise
+        breaker.succeed()
+        self.__count_flash("ir_sends", started)
+
+    @traced
+    def flash_many(self, infrared_codes, transmitter=DEFAULT_TRANSMITTER):
+        """Send the infrared codes back-to-back with the transmitter, the codes of a scene.
+        """
+        if self.__dryrun:
+            LOGGER.info("Infrared: %s (dry run)", infrared_codes)
             return
 
-        send_command = send_command_line.split()
-        process = subprocess.run(send_command, text=True, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
-        if process.returncode != 0:
-            LOGGER.error(f"command line: {send_command}")
-            LOGGER.error(f"error code: {process.returncode}")
-            LOGGER.error(f"error message: {process.stdout}")
-            process.check_returncode()
+        breaker = self.__check_circuit(transmitter)
+        started = perf_counter()
+        try:
+            self.__transmitters[transmitter].transmit_many(infrared_codes)
+        except Exception:
+            breaker.fail()
+            self.__count_flash("ir_failures", started)
+            raise
+        breaker.succeed()
+        self.__count_flash("ir_sends", started, len(infrared_codes))
 
-        LOGGER.debug(f"END")
+    @traced
+    async def flash_many_async(self, infrared_codes, transmitter=DEFAULT_TRANSMITTER):
+        if self.__dryrun:
+            LOGGER.info("Infrared: %s (dry run)", infrared_codes)
+            return
+
+        breaker = self.__check_circuit(transmitter)
+        started = perf_counter()
+        try:
+            await self.__transmitters[transmitter].transmit_many_async(infrared_codes)
+        except Exception:
+            breaker.fail()
+            self.__count_flash("ir_failures", started)
+            raise
+        breaker.succeed()
+        self.__count_flash("ir_sends", started, len(infrared_codes))
+
+    def __check_circuit(self, transmitter):
+        # fail fast without touching the transmitter while it is unhealthy.
+        breaker = self.__breakers[transmitter]
+        try:
+            breaker.check()
+        except CircuitOpenError:
+            if self.__metrics is not None:
+                self.__metrics.increment("ir_rejected")
+            raise
+        return breaker
+
+    def __count_flash(self, counter, started, amount=1):
+        if self.__metrics is None:
+            return
+        self.__metrics.observe("flash", perf_counter() - started)
+        self.__metrics.increment(counter, amount)
 
 
 if __name__ == "__main__":
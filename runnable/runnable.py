@@ -31,15 +31,24 @@
 # Python 3.8 or later supports the Final feature
 # from typing import Final
 
+# measure the startup from the first import.
+from time import perf_counter
+from time import process_time
+STARTUP_STARTED = perf_counter()
+STARTUP_INTERPRETER = process_time()
+
 import os
 import sys
+import signal
 import logging
-import json
 from threading import Thread
 
 from multilogger import MultiLogger
+from multilogger import traced
 from commandoption import CommandOption
-from infraredrunnable import InfraredRunnable
+from jsoncodec import JsonCodec
+from messagewriter import MessageWriter
+from startupprofile import StartupProfile
 
 
 ######################
@@ -52,64 +61,154 @@ LOGGER_LOG_ROOT_PATH = "/var/log/"
 LOGGER_LOG_USER_PATH = os.environ.get("HOME") + "/"
 LOGGER_LOG_FILENAME = "runnable.log"
 
+# STATE_ROOT_PATH: Final[str] = "/var/tmp/"
+# STATE_USER_PATH: Final[str] = os.environ.get("HOME") + "/"
+# STATE_FILENAME: Final[str] = "runnable-state.json"
+STATE_ROOT_PATH = "/var/tmp/"
+STATE_USER_PATH = os.environ.get("HOME") + "/"
+STATE_FILENAME = "runnable-state.json"
+# HISTORY_FILENAME: Final[str] = "runnable-history.bin"
+HISTORY_FILENAME = "runnable-history.bin"
+# PROFILE_FILENAME: Final[str] = "runnable-profile"
+PROFILE_FILENAME = "runnable-profile"
+
 
 ######################
 #    Script Code     #
 ######################
-# Parse the command options
 logging.setLoggerClass(MultiLogger)
 # LOGGER: Final[MultiLogger] = logging.getLogger(__name__)
 LOGGER = logging.getLogger(__name__)
 
-comand_options = CommandOption(LOGGER)
+STARTUP_PROFILE = StartupProfile(STARTUP_STARTED, STARTUP_INTERPRETER)
+STARTUP_PROFILE.mark("import the common modules")
 
 
 class Runnable:
-    def __init__(self):
-        LOGGER.debug(f"STR")
-
+    @traced
+    def __init__(self, codec_name="auto", capture_file=None, startup_profile=None):
+        self.__codec = JsonCodec(LOGGER, codec_name)
+        self.__writer = MessageWriter(LOGGER, self.__codec)
+        self.__capture = None
+        if capture_file is not None:
+            from trafficcapture import TrafficCapture
+            self.__capture = TrafficCapture(LOGGER, capture_file)
+        self.__startup_profile = startup_profile
+
+    @traced
     def run(self):
-        LOGGER.debug(f"STR")
-
+        self.__writer.start()
         thread = Thread(target=self.__loop)
         thread.start()
 
         # wait for closing stdin
         thread.join()
+        # wait for writing the sent messages
+        self.__writer.stop()
+        if self.__capture is not None:
+            self.__capture.close()
 
-        LOGGER.debug(f"END")
-
+    @traced
     def __loop(self):
-        LOGGER.debug(f"STR")
-        for line in sys.stdin:
-            LOGGER.info(f"received: {line.strip()}")
-            message = json.loads(line)
+        for line in sys.stdin.buffer:
+            if self.__startup_profile is not None:
+                self.__startup_profile.finish("read the first message")
+                self.__startup_profile = None
+            LOGGER.info("received: %s", line.decode(errors="replace").strip())
+            message = self.__codec.decode(line)
+            if self.__capture is not None:
+                self.__capture.record(line)
             self.__send(message)
-        LOGGER.debug(f"END")
 
     def __send(self, message):
-        text = json.dumps(message)
-        LOGGER.info(f"send: {text}")
-        sys.stdout.write(text + "\n")
-        sys.stdout.flush()
+        self.__writer.write(message)
 
 
 if __name__ == "__main__":
+    # Parse the command options
+    comand_options = CommandOption(LOGGER)
+    STARTUP_PROFILE.mark("parse the command options")
+    startup_profile = STARTUP_PROFILE if comand_options.get_startup_profile() else None
+
     # check the root user
     is_root = os.geteuid() == 0 and os.getuid() == 0
 
     log_filename = (LOGGER_LOG_ROOT_PATH if is_root else LOGGER_LOG_USER_PATH) + LOGGER_LOG_FILENAME
     LOGGER.enable_filehandler(log_filename)
+    # write the log file on the background thread, not on the message handling.
+    LOGGER.enable_background()
 
     LOGGER.debug("LOG START")
 
     if comand_options.get_verbose():
         LOGGER.set_verbose()
+    STARTUP_PROFILE.mark("open the log file")
+
+    # import the modules of the selected mode only, the test mode never loads the hardware libraries.
+    if comand_options.get_connect():
+        from runnableshim import RunnableShim
+        STARTUP_PROFILE.mark("import the shim")
+
+        # the daemon holds the infrared transmitter and the sensor, the shim only relays the messages.
+        try:
+            if startup_profile is not None:
+                startup_profile.finish("start the shim")
+            RunnableShim(LOGGER, comand_options.get_connect()).run()
+        except OSError as error:
+            LOGGER.error(f"Not connect to the daemon: {error}")
+            sys.exit(1)
+        sys.exit(0)
+
+    # the profiler waits for SIGUSR2 to sample without --profile.
+    from samplingprofiler import SamplingProfiler
+    profile = comand_options.get_profile()
+    profile_path = profile or (STATE_ROOT_PATH if is_root else STATE_USER_PATH) + PROFILE_FILENAME
+    profiler = SamplingProfiler(LOGGER, profile_path)
+    profiler.start(enabled=profile is not None)
+    signal.signal(signal.SIGUSR1, lambda signum, frame: profiler.request_dump())
+    signal.signal(signal.SIGUSR2, lambda signum, frame: profiler.request_switch())
+    STARTUP_PROFILE.mark("start the profiler")
 
     runnable = None
-    if comand_options.get_test():
-        runnable = Runnable()
+    if comand_options.get_test() and comand_options.get_fleet() is not None:
+        from simulatedfleet import SimulatedFleet
+        capture = None
+        if comand_options.get_capture_file() is not None:
+            from trafficcapture import TrafficCapture
+            capture = TrafficCapture(LOGGER, comand_options.get_capture_file())
+        runnable = SimulatedFleet(LOGGER, JsonCodec(LOGGER, comand_options.get_codec()), comand_options.get_fleet(),
+                                  comand_options.get_fleet_latency(), comand_options.get_fleet_interval(),
+                                  comand_options.get_fleet_ramp(), capture, startup_profile)
+        STARTUP_PROFILE.mark("create SimulatedFleet")
+        runnable.run()
+        if capture is not None:
+            capture.close()
+    elif comand_options.get_test():
+        runnable = Runnable(comand_options.get_codec(), comand_options.get_capture_file(), startup_profile)
+        STARTUP_PROFILE.mark("create Runnable")
+        runnable.run()
     else:
-        runnable = InfraredRunnable(LOGGER, comand_options.get_dryrun())
-
-    runnable.run()
+        from infraredrunnable import InfraredRunnable
+        STARTUP_PROFILE.mark("import InfraredRunnable")
+
+        state_file = comand_options.get_state_file()
+        if state_file is None:
+            state_file = (STATE_ROOT_PATH if is_root else STATE_USER_PATH) + STATE_FILENAME
+        history_file = comand_options.get_history_file()
+        if history_file is None:
+            history_file = (STATE_ROOT_PATH if is_root else STATE_USER_PATH) + HISTORY_FILENAME
+
+        runnable = InfraredRunnable(LOGGER, comand_options.get_dryrun(), comand_options.get_cache_ttl(),
+                                    comand_options.get_asyncio(), comand_options.get_codec(),
+                                    comand_options.get_metrics_file(), comand_options.get_metrics_interval(),
+                                    comand_options.get_capture_file(), deadline=comand_options.get_deadline(),
+                                    startup_profile=startup_profile, state_file=state_file,
+                                    history_file=history_file)
+        STARTUP_PROFILE.mark("create InfraredRunnable")
+        runnable.run(comand_options.get_daemon())
+
+    # dump the samples of the last run.
+    profiler.stop()
+
+    if startup_profile is not None:
+        startup_profile.finish("exit without any messages")
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+
+# Copyright (c) 2023 Patineboot. All rights reserved.
+# RunnableDaemon is licensed under CC BY-NC-ND 4.0.
+
+# Attribution-NonCommercial-NoDerivatives 4.0 International
+
+# Under the following terms:
+# Attribution — You must give appropriate credit, provide a
+# link to the license, and indicate if changes were made. You
+# may do so in any reasonable manner, but not in any way that
+# suggests the licensor endorses you or your use.
+# NonCommercial — You may not use the material for
+# commercial purposes.
+# NoDerivatives — If you remix, transform, or build upon the
+# material, you may not distribute the modified material.
+# No additional restrictions — You may not apply legal terms
+# or technological measures that legally restrict others from
+# doing anything the license permits.
+
+# Notices:
+# You do not have to comply with the license for elements of
+# the material in the public domain or where your use is
+# permitted by an applicable exception or limitation.
+
+# No warranties are given. The license may not give you all of
+# the permissions necessary for your intended use. For
+# example, other rights such as publicity, privacy, or moral
+# rights may limit how you use the material.
+
+import os
+import stat
+import socket
+from threading import Thread
+from threading import Lock
+from threading import current_thread
+
+from messagewriter import MessageWriter
+from multilogger import traced
+
+######################
+#      Configure     #
+######################
+# the permission of the socket file, Homebridge and the administrators share the group.
+DAEMON_SOCKET_MODE = 0o660
+# the number of the connections waiting for accepting.
+DAEMON_BACKLOG = 8
+
+######################
+#    Script Code     #
+######################
+LOGGER = None
+
+
+class RunnableDaemon:
+    """RunnableDaemon class.
+
+    The RunnableDaemon class serves the JSON messages of the clients connected to a Unix domain socket.
+    - Read the lines of a client on a thread per client and hand them to the handler with the writer of the client.
+    - Write the messages to a client with a MessageWriter per client, and disconnect a client not reading them.
+    - The handler has ``attach(writer)``, ``receive(line, writer)`` and ``detach(writer)``.
+    """
+
+    @traced
+    def __init__(self, logger, path, codec, handler):
+        """Create a daemon listening on the socket file ``path``.
+        Args:
+            logger: The logger.
+            path: The path of the socket file.
+            codec: The JsonCodec to encode the messages to the clients.
+            handler: The object to handle the lines of the clients.
+        """
+        super().__init__()
+        global LOGGER
+        LOGGER = logger
+
+        self.__path = path
+        self.__codec = codec
+        self.__handler = handler
+        self.__server = None
+        self.__thread = None
+        self.__lock = Lock()
+        self.__connections = set()
+        self.__client_threads = set()
+
+    def start(self):
+        """Listen on the socket file and start the thread to accept the clients.
+        Raises:
+            OSError: The socket file is in use by another daemon or is not a socket.
+        """
+        self.__remove_stale()
+
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(self.__path)
+        os.chmod(self.__path, DAEMON_SOCKET_MODE)
+        server.listen(DAEMON_BACKLOG)
+        self.__server = server
+        LOGGER.info(f"Daemon: listening on {self.__path}")
+
+        thread = Thread(target=self.__accept)
+        thread.start()
+        self.__thread = thread
+        return thread
+
+    def stop(self):
+        """Stop accepting the clients, disconnect them and remove the socket file.
+        """
+        if self.__server is None:
+            return
+
+        # shutdown wakes the accept of the thread up, close alone does not.
+        try:
+            self.__server.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.__server.close()
+        self.__thread.join()
+        self.__server = None
+
+        with self.__lock:
+            connections = list(self.__connections)
+            threads = list(self.__client_threads)
+        for connection in connections:
+            try:
+                connection.shutdown(socket.SHUT_RD)
+            except OSError:
+                pass
+        for thread in threads:
+            thread.join()
+
+        if os.path.exists(self.__path):
+            os.remove(self.__path)
+        LOGGER.info(f"Daemon: closed {self.__path}")
+
+    def __remove_stale(self):
+        if not os.path.exists(self.__path):
+            return
+        if not stat.S_ISSOCK(os.stat(self.__path).st_mode):
+            raise OSError(f"{self.__path} is not a socket")
+
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(self.__path)
+        except OSError:
+            # no daemon listens on the socket file left by a crashed daemon.
+            os.remove(self.__path)
+            return
+        finally:
+            probe.close()
+        raise OSError(f"another daemon listens on {self.__path}")
+
+    @traced
+    def __accept(self):
+        while True:
+            try:
+                connection, _ = self.__server.accept()
+            except OSError:
+                # the server is closed.
+                break
+            thread = Thread(target=self.__serve, args=(connection,))
+            with self.__lock:
+                self.__connections.add(connection)
+                self.__client_threads.add(thread)
+            thread.start()
+
+    def __disconnect(self, connection):
+        # the reader of the client ends, and the blocked writes of the client fail.
+        LOGGER.warning("Daemon: disconnect a client not reading the messages")
+        try:
+            connection.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    @traced
+    def __serve(self, connection):
+        stream = connection.makefile("wb")
+        writer = MessageWriter(LOGGER, self.__codec, stream, overflow=lambda: self.__disconnect(connection))
+        writer.start()
+        self.__handler.attach(writer)
+        LOGGER.info("Daemon: a client connected")
+        try:
+            with connection.makefile("rb") as reader:
+                for line in reader:
+                    self.__receive(line, writer)
+        except OSError as error:
+            LOGGER.warning(f"Daemon: Not read the client: {error}")
+        finally:
+            # answer the pending requests of the client before disconnecting it.
+            self.__handler.detach(writer)
+            writer.stop()
+            try:
+                stream.close()
+            except OSError:
+                pass
+            connection.close()
+            with self.__lock:
+                self.__connections.discard(connection)
+                self.__client_threads.discard(current_thread())
+            LOGGER.info("Daemon: a client disconnected")
+
+    def __receive(self, line, writer):
+        # a failed line never disconnects the client.
+        try:
+            self.__handler.receive(line, writer)
+        except Exception as error:
+            LOGGER.error(f"Daemon: Failed to handle the line of a client: {error!r}")
+
+
+if __name__ == "__main__":
+    print("RunnableDaemon is an Import Module.")
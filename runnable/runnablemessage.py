@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+
+# Copyright (c) 2023 Patineboot. All rights reserved.
+# RunnableMessage is licensed under CC BY-NC-ND 4.0.
+
+# Attribution-NonCommercial-NoDerivatives 4.0 International
+
+# Under the following terms:
+# Attribution — You must give appropriate credit, provide a
+# link to the license, and indicate if changes were made. You
+# may do so in any reasonable manner, but not in any way that
+# suggests the licensor endorses you or your use.
+# NonCommercial — You may not use the material for
+# commercial purposes.
+# NoDerivatives — If you remix, transform, or build upon the
+# material, you may not distribute the modified material.
+# No additional restrictions — You may not apply legal terms
+# or technological measures that legally restrict others from
+# doing anything the license permits.
+
+# Notices:
+# You do not have to comply with the license for elements of
+# the material in the public domain or where your use is
+# permitted by an applicable exception or limitation.
+
+# No warranties are given. The license may not give you all of
+# the permissions necessary for your intended use. For
+# example, other rights such as publicity, privacy, or moral
+# rights may limit how you use the material.
+
+import sys
+
+######################
+#      Configure     #
+######################
+# the number of the pre-encoded heads kept of each method, the names of the clients never grow them over it.
+MESSAGE_HEADS_SIZE = 1024
+
+######################
+#    Script Code     #
+######################
+
+# the pre-encoded heads of the messages, the keys are the names of them.
+# the heads of the names after the first ones are encoded each time, so unknown names never fill the memory.
+SET_HEADS = {}
+ACK_HEADS = {}
+
+
+class SetMessage:
+    """SetMessage class.
+
+    The SetMessage class is a SET message changing or reporting a characteristic of an accessory.
+    - Keep the fields in the slots, not in a dictionary per message.
+    - Intern the accessory name and the characteristic name, the messages share the strings.
+    - Encode the value only into the pre-encoded head of the names, the status is not sent.
+    """
+
+    __slots__ = ("name", "characteristic", "value", "status")
+
+    def __init__(self, name, characteristic, value, status=None):
+        """Create a SET message.
+        Args:
+            name: The accessory name.
+            characteristic: The characteristic name.
+            value: The value of the characteristic.
+            status: The dictionary of the current characteristics of the accessory, received only.
+        """
+        self.name = sys.intern(name)
+        self.characteristic = sys.intern(characteristic)
+        self.value = value
+        self.status = status if status is not None else {}
+
+    @classmethod
+    def from_dict(cls, message):
+        """Create a SET message of the decoded dictionary ``message``.
+        """
+        return cls(message["name"], message["characteristic"], message["value"], message.get("status"))
+
+    def state(self):
+        """Get the state of the accessory changed by the message.
+        Returns:
+            The new dictionary of the status with the value of the characteristic.
+        """
+        state = dict(self.status)
+        state[self.characteristic] = self.value
+        return state
+
+    def encode(self, codec):
+        """Encode the message into the bytes of a line with ``codec``.
+        """
+        key = (self.name, self.characteristic)
+        head = SET_HEADS.get(key)
+        if head is None:
+            head = b'{"method":"SET","name":' + codec.encode_value(self.name) \
+                + b',"characteristic":' + codec.encode_value(self.characteristic) + b',"value":'
+            if len(SET_HEADS) < MESSAGE_HEADS_SIZE:
+                SET_HEADS[key] = head
+        return head + codec.encode_value(self.value) + b"}\n"
+
+    def __repr__(self):
+        return f"SET {self.name} {self.characteristic}={self.value!r} {self.status}"
+
+
+class AckMessage:
+    """AckMessage class.
+
+    The AckMessage class is an ACK message answering a request with the status of an accessory.
+    - Keep the fields in the slots, not in a dictionary per message.
+    - Encode the id and the status into the pre-encoded head of the accessory name.
+    """
+
+    __slots__ = ("name", "id", "status", "reason")
+
+    def __init__(self, name, request_id, status, reason=None):
+        """Create an ACK message.
+        Args:
+            name: The accessory name, or the scene name.
+            request_id: The id of the request, not sent if None.
+            status: The dictionary of the characteristics of the accessory.
+            reason: 'dropped' or 'failed' for the request without the change, None if done.
+        """
+        self.name = name
+        self.id = request_id
+        self.status = status
+        self.reason = reason
+
+    def encode(self, codec):
+        """Encode the message into the bytes of a line with ``codec``.
+        """
+        head = ACK_HEADS.get(self.name)
+        if head is None:
+            head = b'{"method":"ACK","name":' + codec.encode_value(self.name)
+            if len(ACK_HEADS) < MESSAGE_HEADS_SIZE:
+                ACK_HEADS[self.name] = head
+        chunks = [head]
+        if self.id is not None:
+            chunks.append(b',"id":' + codec.encode_value(self.id))
+        chunks.append(b',"status":' + codec.encode_value(self.status))
+        if self.reason is not None:
+            chunks.append(b',"' + self.reason.encode() + b'":true')
+        chunks.append(b"}\n")
+        return b"".join(chunks)
+
+    def __repr__(self):
+        return f"ACK {self.name} {self.id} {self.status} {self.reason or ''}"
+
+
+if __name__ == "__main__":
+    print("RunnableMessage is an Import Module.")
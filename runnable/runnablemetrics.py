@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+
+# Copyright (c) 2023 Patineboot. All rights reserved.
+# RunnableMetrics is licensed under CC BY-NC-ND 4.0.
+
+# Attribution-NonCommercial-NoDerivatives 4.0 International
+
+# Under the following terms:
+# Attribution — You must give appropriate credit, provide a
+# link to the license, and indicate if changes were made. You
+# may do so in any reasonable manner, but not in any way that
+# suggests the licensor endorses you or your use.
+# NonCommercial — You may not use the material for
+# commercial purposes.
+# NoDerivatives — If you remix, transform, or build upon the
+# material, you may not distribute the modified material.
+# No additional restrictions — You may not apply legal terms
+# or technological measures that legally restrict others from
+# doing anything the license permits.
+
+# Notices:
+# You do not have to comply with the license for elements of
+# the material in the public domain or where your use is
+# permitted by an applicable exception or limitation.
+
+# No warranties are given. The license may not give you all of
+# the permissions necessary for your intended use. For
+# example, other rights such as publicity, privacy, or moral
+# rights may limit how you use the material.
+
+import os
+import math
+from bisect import bisect_left
+from threading import Lock
+from threading import Thread
+from threading import Event
+
+from multilogger import traced
+
+######################
+#      Configure     #
+######################
+# the upper bounds in seconds of the latency buckets.
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, math.inf)
+# the seconds to rewrite the metrics file.
+METRICS_INTERVAL = 15
+# the prefix of the metric names in the metrics file.
+METRICS_PREFIX = "runnable"
+
+######################
+#    Script Code     #
+######################
+LOGGER = None
+
+
+class RunnableMetrics:
+    """RunnableMetrics class.
+
+    The RunnableMetrics class keeps the counters, gauges and latency histograms of the stages.
+    - Count a latency into fixed buckets, so the memory does not grow with the messages.
+    - Read the gauges from their functions at the time of a snapshot.
+    - Rewrite a Prometheus text file periodically if a file is given.
+    """
+
+    @traced
+    def __init__(self, logger, buckets=LATENCY_BUCKETS):
+        """Create metrics.
+        Args:
+            logger: The logger.
+            buckets: The upper bounds in seconds of the latency buckets, the last one is infinity.
+        """
+        super().__init__()
+        global LOGGER
+        LOGGER = logger
+
+        self.__buckets = buckets
+        self.__lock = Lock()
+        self.__counters = {}
+        self.__gauges = {}
+        # the stage name to the list of the bucket counts, the count, the sum and the max.
+        self.__latencies = {}
+        self.__stopped = Event()
+        self.__thread = None
+
+    def increment(self, name, amount=1):
+        """Add ``amount`` to the counter ``name``.
+        """
+        with self.__lock:
+            self.__counters[name] = self.__counters.get(name, 0) + amount
+
+    def register_gauge(self, name, function):
+        """Register the gauge ``name`` whose value ``function`` returns.
+        """
+        with self.__lock:
+            self.__gauges[name] = function
+
+    def observe(self, stage, seconds):
+        """Count the latency ``seconds`` of ``stage``.
+        """
+        index = bisect_left(self.__buckets, seconds)
+        with self.__lock:
+            latency = self.__latencies.get(stage)
+            if latency is None:
+                latency = [[0] * len(self.__buckets), 0, 0.0, 0.0]
+                self.__latencies[stage] = latency
+            latency[0][index] += 1
+            latency[1] += 1
+            latency[2] += seconds
+            latency[3] = max(latency[3], seconds)
+
+    def snapshot(self):
+        """Get the current values of the metrics.
+        Returns:
+            The dictionary of the counters, the gauges and the latencies with the cumulative buckets.
+        """
+        with self.__lock:
+            counters = dict(self.__counters)
+            gauges = dict(self.__gauges)
+            latencies = {stage: (list(buckets), count, total, peak)
+                         for stage, (buckets, count, total, peak) in self.__latencies.items()}
+
+        latency = {}
+        for stage, (buckets, count, total, peak) in latencies.items():
+            cumulative = 0
+            counts = {}
+            for bound, bucket in zip(self.__buckets, buckets):
+                cumulative += bucket
+                counts[self.__format_bound(bound)] = cumulative
+            latency[stage] = {"count": count, "sum": total, "max": peak, "buckets": counts}
+
+        return {
+            "counters": counters,
+            "gauges": {name: function() for name, function in gauges.items()},
+            "latency": latency,
+        }
+
+    def to_prometheus(self):
+        """Format the current values of the metrics in the Prometheus text format.
+        """
+        snapshot = self.snapshot()
+        lines = []
+        for name, value in sorted(snapshot["counters"].items()):
+            lines.append(f"# TYPE {METRICS_PREFIX}_{name}_total counter")
+            lines.append(f"{METRICS_PREFIX}_{name}_total {value}")
+        for name, value in sorted(snapshot["gauges"].items()):
+            lines.append(f"# TYPE {METRICS_PREFIX}_{name} gauge")
+            lines.append(f"{METRICS_PREFIX}_{name} {value}")
+
+        metric = f"{METRICS_PREFIX}_stage_latency_seconds"
+        if snapshot["latency"]:
+            lines.append(f"# TYPE {metric} histogram")
+        for stage, latency in sorted(snapshot["latency"].items()):
+            for bound, count in latency["buckets"].items():
+                lines.append(f'{metric}_bucket{{stage="{stage}",le="{bound}"}} {count}')
+            lines.append(f'{metric}_sum{{stage="{stage}"}} {latency["sum"]}')
+            lines.append(f'{metric}_count{{stage="{stage}"}} {latency["count"]}')
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """Rewrite the metrics file ``path`` at once, so a reader never sees a partial file.
+        """
+        temporary = path + ".tmp"
+        with open(temporary, "w") as file:
+            file.write(self.to_prometheus())
+        os.replace(temporary, path)
+
+    def start(self, path, interval=METRICS_INTERVAL):
+        """Start the thread to rewrite the metrics file ``path`` every ``interval`` seconds.
+        """
+        self.__stopped.clear()
+        thread = Thread(target=self.__run, args=(path, interval), daemon=True)
+        thread.start()
+        self.__thread = thread
+        return thread
+
+    def stop(self):
+        """Stop the thread after rewriting the metrics file the last time.
+        """
+        if self.__thread is None:
+            return
+        self.__stopped.set()
+        self.__thread.join()
+        self.__thread = None
+
+    @traced
+    def __run(self, path, interval):
+        while True:
+            stopped = self.__stopped.wait(interval)
+            try:
+                self.write(path)
+            except OSError as error:
+                LOGGER.warning(f"Not write the metrics file: {error}")
+            if stopped:
+                break
+
+    def __format_bound(self, bound):
+        return "+Inf" if bound == math.inf else repr(bound)
+
+
+if __name__ == "__main__":
+    print("RunnableMetrics is an Import Module.")
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+
+# Copyright (c) 2023 Patineboot. All rights reserved.
+# RunnableShim is licensed under CC BY-NC-ND 4.0.
+
+# Attribution-NonCommercial-NoDerivatives 4.0 International
+
+# Under the following terms:
+# Attribution — You must give appropriate credit, provide a
+# link to the license, and indicate if changes were made. You
+# may do so in any reasonable manner, but not in any way that
+# suggests the licensor endorses you or your use.
+# NonCommercial — You may not use the material for
+# commercial purposes.
+# NoDerivatives — If you remix, transform, or build upon the
+# material, you may not distribute the modified material.
+# No additional restrictions — You may not apply legal terms
+# or technological measures that legally restrict others from
+# doing anything the license permits.
+
+# Notices:
+# You do not have to comply with the license for elements of
+# the material in the public domain or where your use is
+# permitted by an applicable exception or limitation.
+
+# No warranties are given. The license may not give you all of
+# the permissions necessary for your intended use. For
+# example, other rights such as publicity, privacy, or moral
+# rights may limit how you use the material.
+
+import sys
+import socket
+from threading import Thread
+
+from multilogger import traced
+
+######################
+#      Configure     #
+######################
+# the bytes to copy at once.
+SHIM_BUFFER_SIZE = 65536
+
+######################
+#    Script Code     #
+######################
+LOGGER = None
+
+
+class RunnableShim:
+    """RunnableShim class.
+
+    The RunnableShim class connects the standard input and output to a RunnableDaemon.
+    - Copy the bytes of the standard input to the socket and the bytes of the socket to the standard output.
+    - Close the sending side of the socket at the end of the standard input,
+      and wait for the daemon to answer the pending requests and disconnect.
+    """
+
+    @traced
+    def __init__(self, logger, path):
+        """Create a shim to the daemon listening on the socket file ``path``.
+        Args:
+            logger: The logger.
+            path: The path of the socket file.
+        """
+        super().__init__()
+        global LOGGER
+        LOGGER = logger
+
+        self.__path = path
+
+    @traced
+    def run(self):
+        """Copy the standard input and output to the daemon until the daemon disconnects.
+        Raises:
+            OSError: Not connect to the daemon.
+        """
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        connection.connect(self.__path)
+        LOGGER.info(f"Shim: connected to {self.__path}")
+
+        thread = Thread(target=self.__send, args=(connection,), daemon=True)
+        thread.start()
+        try:
+            self.__receive(connection)
+        finally:
+            connection.close()
+            LOGGER.info(f"Shim: disconnected from {self.__path}")
+
+    @traced
+    def __send(self, connection):
+        source = sys.stdin.buffer.raw
+        try:
+            while True:
+                data = source.read(SHIM_BUFFER_SIZE)
+                if not data:
+                    break
+                connection.sendall(data)
+            connection.shutdown(socket.SHUT_WR)
+        except OSError as error:
+            LOGGER.warning(f"Shim: Not send to the daemon: {error}")
+
+    @traced
+    def __receive(self, connection):
+        target = sys.stdout.buffer
+        while True:
+            data = connection.recv(SHIM_BUFFER_SIZE)
+            if not data:
+                break
+            target.write(data)
+            target.flush()
+
+
+if __name__ == "__main__":
+    print("RunnableShim is an Import Module.")
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+
+# Copyright (c) 2023 Patineboot. All rights reserved.
+# SamplingProfiler is licensed under CC BY-NC-ND 4.0.
+
+# Attribution-NonCommercial-NoDerivatives 4.0 International
+
+# Under the following terms:
+# Attribution — You must give appropriate credit, provide a
+# link to the license, and indicate if changes were made. You
+# may do so in any reasonable manner, but not in any way that
+# suggests the licensor endorses you or your use.
+# NonCommercial — You may not use the material for
+# commercial purposes.
+# NoDerivatives — If you remix, transform, or build upon the
+# material, you may not distribute the modified material.
+# No additional restrictions — You may not apply legal terms
+# or technological measures that legally restrict others from
+# doing anything the license permits.
+
+# Notices:
+# You do not have to comply with the license for elements of
+# the material in the public domain or where your use is
+# permitted by an applicable exception or limitation.
+
+# No warranties are given. The license may not give you all of
+# the permissions necessary for your intended use. For
+# example, other rights such as publicity, privacy, or moral
+# rights may limit how you use the material.
+
+import os
+import sys
+import threading
+from time import perf_counter
+from collections import Counter
+
+from multilogger import traced
+
+######################
+#      Configure     #
+######################
+# the seconds between the samples of the stacks of all the threads.
+PROFILE_SAMPLE_INTERVAL = 0.02
+# the seconds between the dumps of the profile while sampling.
+PROFILE_DUMP_INTERVAL = 60
+# the number of the functions in the totals file.
+PROFILE_TOP = 50
+
+######################
+#    Script Code     #
+######################
+LOGGER = None
+
+
+class SamplingProfiler:
+    """SamplingProfiler class.
+
+    The SamplingProfiler class samples the stacks of all the threads of the running process.
+    - Take the stacks of the threads on its own thread, the sampled threads run as they are.
+    - Dump the collapsed stacks for a flame graph and the per-function totals periodically and on request.
+    - Switch the sampling on and off at runtime, a switched off profiler only waits for the requests.
+    """
+
+    @traced
+    def __init__(self, logger, path, interval=PROFILE_SAMPLE_INTERVAL, dump_interval=PROFILE_DUMP_INTERVAL):
+        """Create a sampling profiler dumping to the files of the prefix ``path``.
+        Args:
+            logger: The logger.
+            path: The prefix of the dumped files, ``path``.folded of the collapsed stacks,
+                and ``path``.txt of the per-function totals.
+            interval: The seconds between the samples.
+            dump_interval: The seconds between the dumps while sampling.
+        """
+        super().__init__()
+        global LOGGER
+        LOGGER = logger
+
+        self.__path = path
+        self.__interval = interval
+        self.__dump_interval = dump_interval
+        self.__enabled = False
+        self.__switch_requested = False
+        self.__dump_requested = False
+        self.__stopped = False
+        self.__wakeup = threading.Event()
+        self.__thread = None
+        # the collapsed stacks to the numbers of the samples.
+        self.__stacks = Counter()
+        self.__samples = 0
+        self.__started = perf_counter()
+        # the labels of the code objects, a label is made once per function.
+        self.__labels = {}
+
+    def start(self, enabled=False):
+        """Start the thread of the profiler, and sample from now if ``enabled``.
+        """
+        self.__switch_requested = enabled
+        thread = threading.Thread(target=self.__run, name="profiler", daemon=True)
+        thread.start()
+        self.__thread = thread
+        return thread
+
+    def stop(self):
+        """Stop the thread of the profiler after dumping the samples.
+        """
+        if self.__thread is None:
+            return
+        self.__stopped = True
+        self.__wakeup.set()
+        self.__thread.join()
+        self.__thread = None
+
+    def request_dump(self):
+        """Request to dump the samples, safe to call on a signal handler.
+        """
+        self.__dump_requested = True
+        self.__wakeup.set()
+
+    def request_switch(self):
+        """Request to switch the sampling on or off, safe to call on a signal handler.
+        """
+        self.__switch_requested = True
+        self.__wakeup.set()
+
+    @traced
+    def __run(self):
+        next_dump = None
+        while not self.__stopped:
+            # clear the wakeup before taking the requests, a request from now wakes the next wait up.
+            self.__wakeup.clear()
+            if self.__switch_requested:
+                self.__switch_requested = False
+                self.__switch()
+                next_dump = perf_counter() + self.__dump_interval
+
+            if self.__enabled:
+                self.__sample()
+                if perf_counter() >= next_dump:
+                    self.__dump_requested = True
+                    next_dump = perf_counter() + self.__dump_interval
+            if self.__dump_requested:
+                self.__dump_requested = False
+                self.__dump()
+
+            # a switched off profiler sleeps until a request.
+            self.__wakeup.wait(self.__interval if self.__enabled else None)
+
+        if self.__enabled:
+            self.__dump()
+
+    def __switch(self):
+        if self.__enabled:
+            self.__enabled = False
+            self.__dump()
+            LOGGER.warning("Profiler: stopped sampling")
+            return
+
+        # a new profile from switching on.
+        self.__stacks.clear()
+        self.__samples = 0
+        self.__started = perf_counter()
+        self.__enabled = True
+        LOGGER.warning(f"Profiler: started sampling every {self.__interval} seconds to {self.__path}")
+
+    def __sample(self):
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        own = threading.get_ident()
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                label = self.__labels.get(code)
+                if label is None:
+                    label = f"{os.path.basename(code.co_filename)}:{code.co_name}"
+                    self.__labels[code] = label
+                stack.append(label)
+                frame = frame.f_back
+            stack.append(names.get(ident, str(ident)))
+            stack.reverse()
+            self.__stacks[";".join(stack)] += 1
+        self.__samples += 1
+
+    def __dump(self):
+        try:
+            self.__write(self.__path + ".folded", self.__format_stacks())
+            self.__write(self.__path + ".txt", self.__format_totals())
+        except OSError as error:
+            LOGGER.warning(f"Not write the profile: {error}")
+            return
+        LOGGER.info(f"Profiler: dumped {self.__samples} samples to {self.__path}")
+
+    def __format_stacks(self):
+        # the collapsed stacks of flamegraph.pl and speedscope.
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(self.__stacks.items()))
+
+    def __format_totals(self):
+        own = Counter()
+        total = Counter()
+        for stack, count in self.__stacks.items():
+            # the thread name is the root of the stack, not a function.
+            functions = stack.split(";")[1:]
+            if not functions:
+                continue
+            own[functions[-1]] += count
+            for function in set(functions):
+                total[function] += count
+
+        lines = [
+            f"# {self.__samples} samples of the wall clock time every {self.__interval} seconds"
+            f" in {perf_counter() - self.__started:.1f} seconds, the counts of all the threads",
+            f"{'self':>8} {'total':>8}  function",
+        ]
+        for function, count in total.most_common(PROFILE_TOP):
+            lines.append(f"{own[function]:>8} {count:>8}  {function}")
+        return "\n".join(lines) + "\n"
+
+    def __write(self, path, content):
+        # replace the file at once, so a reader never sees a partial file.
+        temporary = path + ".tmp"
+        with open(temporary, "w") as file:
+            file.write(content)
+        os.replace(temporary, path)
+
+
+if __name__ == "__main__":
+    print("SamplingProfiler is an Import Module.")
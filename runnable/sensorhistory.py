@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+
+# Copyright (c) 2023 Patineboot. All rights reserved.
+# SensorHistory is licensed under CC BY-NC-ND 4.0.
+
+# Attribution-NonCommercial-NoDerivatives 4.0 International
+
+# Under the following terms:
+# Attribution — You must give appropriate credit, provide a
+# link to the license, and indicate if changes were made. You
+# may do so in any reasonable manner, but not in any way that
+# suggests the licensor endorses you or your use.
+# NonCommercial — You may not use the material for
+# commercial purposes.
+# NoDerivatives — If you remix, transform, or build upon the
+# material, you may not distribute the modified material.
+# No additional restrictions — You may not apply legal terms
+# or technological measures that legally restrict others from
+# doing anything the license permits.
+
+# Notices:
+# You do not have to comply with the license for elements of
+# the material in the public domain or where your use is
+# permitted by an applicable exception or limitation.
+
+# No warranties are given. The license may not give you all of
+# the permissions necessary for your intended use. For
+# example, other rights such as publicity, privacy, or moral
+# rights may limit how you use the material.
+
+import os
+import mmap
+import struct
+from time import time
+from threading import Lock
+
+from multilogger import traced
+
+######################
+#      Configure     #
+######################
+# the tiers of the time series, the seconds of a bucket, 0 as the raw readings, and the number of the records.
+# the raw readings of 2 sensors polled every 10 to 80 seconds cover 2 to 18 days,
+# the 5-minute buckets 30 days, and the hourly buckets a year, in 2 MB.
+HISTORY_TIERS = ((0, 40320), (300, 17280), (3600, 17520))
+# the number of the series, the characteristics of the accessories, recorded in a history file.
+HISTORY_SERIES = 16
+# the number of the points of a range query at most, a coarser tier answers a longer range.
+HISTORY_POINTS = 1000
+
+######################
+#    Script Code     #
+######################
+LOGGER = None
+
+# the magic number and the version of the history file.
+HISTORY_MAGIC = b"RSTS"
+HISTORY_VERSION = 1
+# the header: the magic number, the version, the number of the tiers, the file size,
+# and the head and the count of each tier.
+HEADER_FORMAT = "<4sHHI{}I"
+# the series table: the "name/characteristic" of each series.
+SERIES_NAME = struct.Struct("<64s")
+# the record: the start time of the bucket, the series, the minimum, the average, the maximum and the count.
+RECORD = struct.Struct("<dIfffI")
+
+
+class SensorHistory:
+    """SensorHistory class.
+
+    The SensorHistory class records every sensor reading in a fixed-size binary time series file.
+    - Keep the records of each tier in a ring of fixed-width records, the oldest record is overwritten.
+    - Downsample the readings into the minimum, the average and the maximum of the buckets of the coarser tiers.
+    - Map the file into memory, and read only the records in the range of a query.
+    """
+
+    @traced
+    def __init__(self, logger, path, tiers=HISTORY_TIERS):
+        """Open the history file ``path``, create it if it is missing or of another layout.
+        Args:
+            logger: The logger.
+            path: The path of the history file.
+            tiers: The tuples of the seconds of a bucket, 0 as the raw readings, and the number of the records.
+        """
+        super().__init__()
+        global LOGGER
+        LOGGER = logger
+
+        self.__path = path
+        self.__tiers = tiers
+        self.__lock = Lock()
+        self.__header_struct = struct.Struct(HEADER_FORMAT.format(2 * len(tiers)))
+        # the offset of the records of each tier in the file.
+        self.__offsets = []
+        offset = self.__header_struct.size + SERIES_NAME.size * HISTORY_SERIES
+        for _, capacity in tiers:
+            self.__offsets.append(offset)
+            offset += RECORD.size * capacity
+        self.__size = offset
+        # the open buckets of the coarser tiers, the tier to the series to [start, min, sum, max, count].
+        self.__buckets = [{} for _ in tiers]
+
+        self.__file = self.__open()
+        self.__map = mmap.mmap(self.__file.fileno(), self.__size)
+        if self.__map[:self.__header_struct.size] != self.__header(self.__map_heads()):
+            # a new file or a file of another layout, start a new history.
+            LOGGER.info(f"History: start a new history in {path}")
+            self.__map[:self.__size] = bytes(self.__size)
+            self.__write_header([0] * (2 * len(tiers)))
+        self.__series = self.__load_series()
+        LOGGER.info(f"History: opened {path} of {self.__size} bytes")
+
+    def record(self, name, characteristic, value, recorded=None):
+        """Record the reading ``value`` of the characteristic of the accessory ``name``.
+        Args:
+            recorded: The epoch seconds of the reading, now if None.
+        """
+        if recorded is None:
+            recorded = time()
+        with self.__lock:
+            # the sensor may read once more while closing.
+            if self.__map is None:
+                return
+            series = self.__get_series(f"{name}/{characteristic}")
+            if series is None:
+                return
+            for tier, (step, _) in enumerate(self.__tiers):
+                if step == 0:
+                    self.__append(tier, (recorded, series, value, value, value, 1))
+                    continue
+                self.__accumulate(tier, step, series, recorded, value)
+
+    def query(self, name, characteristic, start, end, max_points=HISTORY_POINTS):
+        """Get the readings of the characteristic of the accessory ``name`` between ``start`` and ``end``.
+        The finest tier covering ``start`` within ``max_points`` records answers the query,
+        and the time of a point of the buckets is the start of the bucket.
+        Returns:
+            The tuple of the seconds of a bucket, 0 as the raw readings,
+            and the list of the points of [time, minimum, average, maximum].
+        """
+        with self.__lock:
+            series = self.__series.get(f"{name}/{characteristic}")
+            if series is None or self.__map is None:
+                return 0, []
+
+            heads = self.__map_heads()
+            # the end of the first record of each tier.
+            firsts = [(tier, step, self.__time(tier, heads, 0) + step)
+                      for tier, (step, _) in enumerate(self.__tiers) if heads[2 * tier + 1] > 0]
+            if not firsts:
+                return 0, []
+            # a history shorter than the range covers it from the oldest record.
+            covered = max(start, min(first for _, _, first in firsts))
+
+            for tier, step, first in firsts:
+                # the buckets overlapping the start.
+                lower = self.__search(tier, heads, start - step, step > 0)
+                upper = self.__search(tier, heads, end, True)
+                chosen = (tier, step, lower, upper)
+                # the finest tier of the records from the start within the points, the coarsest one otherwise.
+                if first <= covered and upper - lower <= max_points:
+                    break
+
+            tier, step, lower, upper = chosen
+            points = []
+            for index in range(lower, upper):
+                recorded, record_series, minimum, average, maximum, _ = self.__read(tier, heads, index)
+                if record_series == series:
+                    # round off the noise of the single precision values.
+                    points.append([recorded, round(minimum, 3), round(average, 3), round(maximum, 3)])
+            return step, points
+
+    def close(self):
+        """Write the open buckets and close the history file.
+        The buckets written on closing restart as new buckets on the next run.
+        """
+        with self.__lock:
+            if self.__map is None:
+                return
+            for tier, buckets in enumerate(self.__buckets):
+                for series, bucket in buckets.items():
+                    self.__append_bucket(tier, series, bucket)
+                buckets.clear()
+            self.__map.flush()
+            self.__map.close()
+            self.__map = None
+            self.__file.close()
+        LOGGER.info(f"History: closed {self.__path}")
+
+    def __open(self):
+        try:
+            file = open(self.__path, "r+b")
+        except FileNotFoundError:
+            file = open(self.__path, "w+b")
+        # allocate the whole file once, the history never grows beyond it.
+        if os.fstat(file.fileno()).st_size != self.__size:
+            file.truncate(self.__size)
+        return file
+
+    def __header(self, heads):
+        return self.__header_struct.pack(HISTORY_MAGIC, HISTORY_VERSION, len(self.__tiers), self.__size, *heads)
+
+    def __map_heads(self):
+        return list(self.__header_struct.unpack_from(self.__map, 0)[4:])
+
+    def __write_header(self, heads):
+        self.__map[:self.__header_struct.size] = self.__header(heads)
+
+    def __load_series(self):
+        series = {}
+        for index in range(HISTORY_SERIES):
+            name = SERIES_NAME.unpack_from(self.__map, self.__header_struct.size + SERIES_NAME.size * index)[0]
+            name = name.rstrip(b"\0").decode(errors="replace")
+            if name:
+                series[name] = index
+        return series
+
+    def __get_series(self, name):
+        # None as a series over the limit.
+        if name in self.__series:
+            return self.__series[name]
+        if len(self.__series) >= HISTORY_SERIES:
+            LOGGER.warning(f"Not record {name}, the history has {HISTORY_SERIES} series at most")
+            self.__series[name] = None
+            return None
+        series = len(self.__series)
+        offset = self.__header_struct.size + SERIES_NAME.size * series
+        SERIES_NAME.pack_into(self.__map, offset, name.encode()[:SERIES_NAME.size])
+        self.__series[name] = series
+        return series
+
+    def __accumulate(self, tier, step, series, recorded, value):
+        start = recorded - recorded % step
+        buckets = self.__buckets[tier]
+        bucket = buckets.get(series)
+        if bucket is not None and bucket[0] != start:
+            # the reading in a new bucket closes the previous bucket.
+            self.__append_bucket(tier, series, bucket)
+            bucket = None
+        if bucket is None:
+            buckets[series] = [start, value, value, value, 1]
+            return
+        bucket[1] = min(bucket[1], value)
+        bucket[2] += value
+        bucket[3] = max(bucket[3], value)
+        bucket[4] += 1
+
+    def __append_bucket(self, tier, series, bucket):
+        start, minimum, total, maximum, count = bucket
+        self.__append(tier, (start, series, minimum, total / count, maximum, count))
+
+    def __append(self, tier, record):
+        heads = self.__map_heads()
+        head, count = heads[2 * tier], heads[2 * tier + 1]
+        capacity = self.__tiers[tier][1]
+        RECORD.pack_into(self.__map, self.__offsets[tier] + RECORD.size * head, *record)
+        heads[2 * tier] = (head + 1) % capacity
+        heads[2 * tier + 1] = min(count + 1, capacity)
+        self.__write_header(heads)
+
+    def __read(self, tier, heads, index):
+        # the index of the records from the oldest one in the ring.
+        head, count = heads[2 * tier], heads[2 * tier + 1]
+        capacity = self.__tiers[tier][1]
+        position = (head - count + index) % capacity
+        return RECORD.unpack_from(self.__map, self.__offsets[tier] + RECORD.size * position)
+
+    def __time(self, tier, heads, index):
+        return self.__read(tier, heads, index)[0]
+
+    def __search(self, tier, heads, recorded, after=False):
+        # the index of the first record at ``recorded``, or after it if ``after``, by a binary search.
+        lower, upper = 0, heads[2 * tier + 1]
+        while lower < upper:
+            middle = (lower + upper) // 2
+            middle_time = self.__time(tier, heads, middle)
+            if middle_time < recorded or after and middle_time == recorded:
+                lower = middle + 1
+            else:
+                upper = middle
+        return lower
+
+
+if __name__ == "__main__":
+    print("SensorHistory is an Import Module.")
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+
+# Copyright (c) 2023 Patineboot. All rights reserved.
+# SensorPolicy is licensed under CC BY-NC-ND 4.0.
+
+# Attribution-NonCommercial-NoDerivatives 4.0 International
+
+# Under the following terms:
+# Attribution — You must give appropriate credit, provide a
+# link to the license, and indicate if changes were made. You
+# may do so in any reasonable manner, but not in any way that
+# suggests the licensor endorses you or your use.
+# NonCommercial — You may not use the material for
+# commercial purposes.
+# NoDerivatives — If you remix, transform, or build upon the
+# material, you may not distribute the modified material.
+# No additional restrictions — You may not apply legal terms
+# or technological measures that legally restrict others from
+# doing anything the license permits.
+
+# Notices:
+# You do not have to comply with the license for elements of
+# the material in the public domain or where your use is
+# permitted by an applicable exception or limitation.
+
+# No warranties are given. The license may not give you all of
+# the permissions necessary for your intended use. For
+# example, other rights such as publicity, privacy, or moral
+# rights may limit how you use the material.
+
+from time import monotonic
+
+from multilogger import traced
+
+######################
+#      Configure     #
+######################
+# the change of the value of a characteristic to report it.
+SENSOR_DEADBANDS = {
+    "CurrentRelativeHumidity": 1.0,
+    "CurrentTemperature": 0.2,
+    "CurrentAmbientLightLevel": 1.0,
+}
+# the seconds to report a characteristic again even if the value does not change.
+SENSOR_MAX_SILENCE = 600
+# the seconds of the polling interval while the readings change.
+SENSOR_MIN_INTERVAL = 10
+# the seconds of the polling interval while the readings are stable.
+SENSOR_MAX_INTERVAL = 80
+
+######################
+#    Script Code     #
+######################
+LOGGER = None
+
+
+class SensorPolicy:
+    """SensorPolicy class.
+
+    The SensorPolicy class decides which sensor readings to report and when to poll next.
+    - Report a characteristic only if the value moves by more than its deadband,
+      or the last report is older than ``max_silence``.
+    - Poll at ``min_interval`` while the readings change, and double the interval
+      up to ``max_interval`` while they are stable.
+    """
+
+    @traced
+    def __init__(self, logger, deadbands=SENSOR_DEADBANDS, max_silence=SENSOR_MAX_SILENCE,
+                 min_interval=SENSOR_MIN_INTERVAL, max_interval=SENSOR_MAX_INTERVAL):
+        """Create a sensor policy.
+        Args:
+            logger: The logger.
+            deadbands: The characteristic names to the change of the value to report.
+            max_silence: The seconds to report a characteristic again.
+            min_interval: The seconds of the polling interval while the readings change.
+            max_interval: The seconds of the polling interval while the readings are stable.
+        """
+        super().__init__()
+        global LOGGER
+        LOGGER = logger
+
+        self.__deadbands = deadbands
+        self.__max_silence = max_silence
+        self.__min_interval = min_interval
+        self.__max_interval = max_interval
+        self.__interval = min_interval
+        self.__changed = False
+        # the tuple of the accessory name and the characteristic to the last reported value and time.
+        self.__reported = {}
+
+    def should_report(self, name, characteristic, value):
+        """Decide to report ``value`` of ``characteristic`` of the accessory ``name``.
+        """
+        key = (name, characteristic)
+        now = monotonic()
+        last = self.__reported.get(key)
+
+        if last is not None:
+            last_value, last_time = last
+            moved = abs(value - last_value) > self.__deadbands.get(characteristic, 0)
+            if not moved and now - last_time < self.__max_silence:
+                return False
+            if moved:
+                self.__changed = True
+
+        self.__reported[key] = (value, now)
+        return True
+
+    def next_interval(self):
+        """Get the seconds to the next polling from the readings since the last call.
+        """
+        if self.__changed:
+            self.__interval = self.__min_interval
+        else:
+            self.__interval = min(self.__interval * 2, self.__max_interval)
+        self.__changed = False
+        return self.__interval
+
+
+if __name__ == "__main__":
+    print("SensorPolicy is an Import Module.")
@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+
+# Copyright (c) 2023 Patineboot. All rights reserved.
+# SensorScheduler is licensed under CC BY-NC-ND 4.0.
+
+# Attribution-NonCommercial-NoDerivatives 4.0 International
+
+# Under the following terms:
+# Attribution — You must give appropriate credit, provide a
+# link to the license, and indicate if changes were made. You
+# may do so in any reasonable manner, but not in any way that
+# suggests the licensor endorses you or your use.
+# NonCommercial — You may not use the material for
+# commercial purposes.
+# NoDerivatives — If you remix, transform, or build upon the
+# material, you may not distribute the modified material.
+# No additional restrictions — You may not apply legal terms
+# or technological measures that legally restrict others from
+# doing anything the license permits.
+
+# Notices:
+# You do not have to comply with the license for elements of
+# the material in the public domain or where your use is
+# permitted by an applicable exception or limitation.
+
+# No warranties are given. The license may not give you all of
+# the permissions necessary for your intended use. For
+# example, other rights such as publicity, privacy, or moral
+# rights may limit how you use the material.
+
+import heapq
+from time import monotonic
+from time import perf_counter
+from threading import Thread
+from threading import Event
+from threading import Condition
+
+from sensorpolicy import SensorPolicy
+from sensorpolicy import SENSOR_MIN_INTERVAL
+from sensorpolicy import SENSOR_MAX_INTERVAL
+from multilogger import traced
+
+######################
+#      Configure     #
+######################
+# the sensors of the infrared HAT without the sensors attribute of the rules file,
+# the sensor name to the type, the attributes of the type, and the characteristics to the accessory names to report.
+DEFAULT_SENSORS = {
+    "bme280": {
+        "type": "bme280",
+        "address": "0x76",
+        "report": {"CurrentRelativeHumidity": "Bikini Humidity", "CurrentTemperature": "Bikini Temperature"},
+    },
+}
+# the seconds a reading of a sensor takes at most, the sensor is skipped while the reading is stuck over it.
+SENSOR_TIMEOUT = 5
+# the seconds between the first readings of the sensors on the same bus.
+SENSOR_STAGGER = 0.5
+# the I2C bus of the sensors on the infrared HAT.
+SENSOR_I2C_BUS = 1
+# the minimum value of the ambient light level of HomeKit.
+SENSOR_MIN_LIGHT_LEVEL = 0.0001
+
+######################
+#    Script Code     #
+######################
+LOGGER = None
+
+# the types of the sensors to whether the sensor is on the I2C bus.
+SENSOR_TYPES = {
+    "bme280": True,
+    "tsl2572": True,
+    "motion": False,
+}
+
+
+class SensorSource:
+    """SensorSource class.
+
+    The SensorSource class is a sensor described in the rules file.
+    - Open the device of the sensor on the first reading, and again after a failed reading.
+    - Measure the characteristics of the type of the sensor.
+    """
+
+    def __init__(self, name, description, policy, device=None):
+        """Create a sensor named ``name`` of ``description``.
+        Raises:
+            ValueError: The description is incorrect.
+        """
+        self.name = name
+        self.type = description.get("type", name)
+        if self.type not in SENSOR_TYPES:
+            raise ValueError(f"Unknown type '{self.type}' of the sensor '{name}', not in {sorted(SENSOR_TYPES)}")
+        if self.type == "motion" and "pin" not in description:
+            raise ValueError(f"Not found the GPIO pin of the motion sensor '{name}'")
+        # the characteristic to the accessory name to report.
+        self.report = description.get("report", {})
+        self.timeout = description.get("timeout", SENSOR_TIMEOUT)
+        # the sensors on the same bus read one by one, None as a sensor of its own GPIO pin.
+        self.bus = ("i2c", description.get("bus", SENSOR_I2C_BUS)) if SENSOR_TYPES[self.type] else None
+        self.policy = policy
+        # the state of the reading in progress, guarded by the scheduler.
+        self.in_progress = False
+        self.readings = 0
+        self.started = 0.0
+        # the number of the reading skipped as stuck, warned once per reading.
+        self.stuck = -1
+        self.__description = description
+        self.__device = device
+        self.__replaced = device is not None
+
+    def measure(self):
+        """Measure the characteristics of the sensor.
+        Returns:
+            The dictionary of the characteristic to the value.
+        """
+        if self.__device is None:
+            self.__device = self.__open()
+        device = self.__device
+        if self.type == "bme280":
+            device.forced()
+            return {"CurrentRelativeHumidity": device.humidity, "CurrentTemperature": device.temperature}
+        if self.type == "tsl2572":
+            device.single_auto_measure()
+            return {"CurrentAmbientLightLevel": max(device.illuminance, SENSOR_MIN_LIGHT_LEVEL)}
+        return {"MotionDetected": bool(device.input(self.__description["pin"]))}
+
+    def reset(self):
+        """Open the device again on the next reading.
+        """
+        if not self.__replaced:
+            self.__device = None
+
+    def __open(self):
+        # import the hardware libraries on reading the sensor, the test mode never loads them.
+        if self.type == "motion":
+            try:
+                import RPi.GPIO as GPIO
+            except ImportError as error:
+                raise RuntimeError(f"RPi.GPIO is not importable to read the motion sensor '{self.name}': {error}")
+            GPIO.setmode(GPIO.BCM)
+            GPIO.setup(self.__description["pin"], GPIO.IN)
+            return GPIO
+
+        try:
+            import cgsensor
+        except ImportError as error:
+            raise RuntimeError(f"cgsensor is not importable to read the sensor '{self.name}': {error}")
+        if self.type == "bme280":
+            return cgsensor.BME280(i2c_addr=int(str(self.__description.get("address", "0x76")), 0))
+        return cgsensor.TSL2572()
+
+
+class SensorScheduler:
+    """SensorScheduler class.
+
+    The SensorScheduler class polls any number of the sensors, each at its own interval.
+    - Read each sensor on a thread of its own, so a slow or stuck sensor never delays the others.
+    - Read the sensors on the same I2C bus one by one, and spread their first readings.
+    - Skip a sensor while its reading is stuck over its timeout, and open a failed sensor again on its next poll.
+    """
+
+    @traced
+    def __init__(self, logger, descriptions, record, metrics=None, devices=None, policy=None):
+        """Create the sensors of ``descriptions``.
+        Args:
+            logger: The logger.
+            descriptions: The dictionary of the sensor name to the description of the sensor.
+            record: The function to record a reading, ``record(name, characteristic, value, policy)``.
+            metrics: The RunnableMetrics to measure the sensor polls.
+            devices: The dictionary of the sensor type to the device replacing the hardware.
+            policy: The SensorPolicy of all the sensors, a policy of each sensor from its description if None.
+        Raises:
+            ValueError: The descriptions are incorrect.
+        """
+        super().__init__()
+        global LOGGER
+        LOGGER = logger
+
+        self.__record = record
+        self.__metrics = metrics
+        self.__stopped = True
+        self.__wakeup = Event()
+        # the readers wait for the reading in progress of a sensor and share it instead of reading again.
+        self.__reading = Condition()
+
+        devices = devices or {}
+        self.__sources = []
+        # the accessory name to the sensors reporting it.
+        self.__names = {}
+        for name, description in descriptions.items():
+            source_policy = policy
+            if source_policy is None:
+                # a sensor of the interval polls at the fixed interval without the max interval.
+                interval = description.get("interval", SENSOR_MIN_INTERVAL)
+                max_interval = description.get("max_interval",
+                                               interval if "interval" in description else SENSOR_MAX_INTERVAL)
+                source_policy = SensorPolicy(logger, min_interval=interval, max_interval=max_interval)
+            source = SensorSource(name, description, source_policy, devices.get(description.get("type", name)))
+            self.__sources.append(source)
+            for accessory in source.report.values():
+                self.__names.setdefault(accessory, []).append(source)
+        # the bus to the tuple of the sensor reading on it and the time it took the bus.
+        self.__buses = {source.bus: None for source in self.__sources if source.bus is not None}
+        LOGGER.info(f"Sensors: {len(self.__sources)} sensors on {len(self.__buses)} buses")
+
+    def is_sensor(self, name):
+        """Check the accessory ``name`` is a reading of a sensor.
+        """
+        return name in self.__names
+
+    def refresh(self, name=None):
+        """Read the sensors reporting the accessory ``name`` now, all the sensors if None.
+        The callers during a reading in progress wait for it and share the values,
+        so concurrent callers trigger one reading of a sensor.
+        """
+        sources = self.__sources if name is None else self.__names.get(name, [])
+        for source in sources:
+            self.__read(source)
+
+    def stop(self):
+        self.__stopped = True
+        self.__wakeup.set()
+
+    @traced
+    def run(self):
+        self.__stopped = False
+        self.__wakeup.clear()
+
+        due = self.__first_due()
+        if not due:
+            return
+        while not self.__stopped:
+            self.__wakeup.wait(self.__poll_due(due))
+
+    @traced
+    async def run_async(self):
+        """Run the sensor polling as a task on the event loop, the readings still run on their threads.
+        """
+        import asyncio
+
+        self.__stopped = False
+
+        due = self.__first_due()
+        if not due:
+            return
+        while not self.__stopped:
+            await asyncio.sleep(self.__poll_due(due))
+
+    def __first_due(self):
+        # spread the first readings of the sensors on the same bus.
+        now = monotonic()
+        offsets = {}
+        due = []
+        for index, source in enumerate(self.__sources):
+            offset = offsets.get(source.bus, 0.0)
+            if source.bus is not None:
+                offsets[source.bus] = offset + SENSOR_STAGGER
+            due.append((now + offset, index))
+        heapq.heapify(due)
+        return due
+
+    def __poll_due(self, due):
+        # start the readings of the due sensors, and get the seconds to the next one.
+        now = monotonic()
+        while due[0][0] <= now:
+            index = due[0][1]
+            source = self.__sources[index]
+            self.__start(source, now)
+            heapq.heapreplace(due, (now + source.policy.next_interval(), index))
+        return due[0][0] - now
+
+    def __start(self, source, now):
+        with self.__reading:
+            in_progress = source.in_progress
+            stuck = in_progress and now - source.started > source.timeout and source.stuck != source.readings
+            if stuck:
+                source.stuck = source.readings
+        if stuck:
+            LOGGER.warning(f"Skip the sensor {source.name} stuck for {now - source.started:.1f} seconds")
+            if self.__metrics is not None:
+                self.__metrics.increment("sensor_timeouts")
+        # a stuck sensor never delays the others, skip it until the reading returns.
+        if in_progress:
+            return
+        Thread(target=self.__poll, args=(source,), name=f"sensor {source.name}", daemon=True).start()
+
+    def __poll(self, source):
+        try:
+            self.__read(source)
+        except Exception as error:
+            LOGGER.error(f"Failed to read the sensor {source.name}: {error}")
+            source.reset()
+            if self.__metrics is not None:
+                self.__metrics.increment("sensor_failures")
+
+    def __read(self, source):
+        with self.__reading:
+            if source.in_progress:
+                readings = source.readings
+                self.__reading.wait_for(lambda: source.readings != readings, source.timeout)
+                return
+            source.in_progress = True
+            source.started = monotonic()
+
+        try:
+            values = self.__measure(source)
+        finally:
+            with self.__reading:
+                source.in_progress = False
+                source.readings += 1
+                self.__reading.notify_all()
+
+        for characteristic, value in values.items():
+            name = source.report.get(characteristic)
+            if name is not None:
+                self.__record(name, characteristic, value, source.policy)
+
+    def __measure(self, source):
+        if source.bus is not None and not self.__take_bus(source):
+            raise TimeoutError(f"The bus of the sensor {source.name} is busy over {source.timeout} seconds")
+        started = perf_counter()
+        try:
+            values = source.measure()
+        finally:
+            if source.bus is not None:
+                self.__give_bus(source)
+        if self.__metrics is not None:
+            self.__metrics.observe("sensor_poll", perf_counter() - started)
+            self.__metrics.increment("sensor_polls")
+        return values
+
+    def __take_bus(self, source):
+        # a reading stuck over its timeout gives up the bus to the other sensors.
+        deadline = monotonic() + source.timeout
+        with self.__reading:
+            while True:
+                now = monotonic()
+                owner = self.__buses[source.bus]
+                if owner is None or now >= owner[1] + owner[0].timeout:
+                    self.__buses[source.bus] = (source, now)
+                    return True
+                if now >= deadline:
+                    return False
+                self.__reading.wait(min(deadline, owner[1] + owner[0].timeout) - now)
+
+    def __give_bus(self, source):
+        with self.__reading:
+            owner = self.__buses[source.bus]
+            if owner is not None and owner[0] is source:
+                self.__buses[source.bus] = None
+                self.__reading.notify_all()
+
+
+if __name__ == "__main__":
+    print("SensorScheduler is an Import Module.")
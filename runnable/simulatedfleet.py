@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+
+# Copyright (c) 2023 Patineboot. All rights reserved.
+# SimulatedFleet is licensed under CC BY-NC-ND 4.0.
+
+# Attribution-NonCommercial-NoDerivatives 4.0 International
+
+# Under the following terms:
+# Attribution — You must give appropriate credit, provide a
+# link to the license, and indicate if changes were made. You
+# may do so in any reasonable manner, but not in any way that
+# suggests the licensor endorses you or your use.
+# NonCommercial — You may not use the material for
+# commercial purposes.
+# NoDerivatives — If you remix, transform, or build upon the
+# material, you may not distribute the modified material.
+# No additional restrictions — You may not apply legal terms
+# or technological measures that legally restrict others from
+# doing anything the license permits.
+
+# Notices:
+# You do not have to comply with the license for elements of
+# the material in the public domain or where your use is
+# permitted by an applicable exception or limitation.
+
+# No warranties are given. The license may not give you all of
+# the permissions necessary for your intended use. For
+# example, other rights such as publicity, privacy, or moral
+# rights may limit how you use the material.
+
+import sys
+import heapq
+import random
+from time import perf_counter
+from time import sleep
+from threading import Thread
+from threading import Event
+from threading import Condition
+from threading import Lock
+
+from messagewriter import MessageWriter
+from runnablemessage import SetMessage
+from runnablemessage import AckMessage
+from multilogger import traced
+
+######################
+#      Configure     #
+######################
+# the seconds a virtual device takes to handle a '_SET_' message on average, as an infrared send does.
+FLEET_LATENCY = 0.1
+# the seconds between the reports of a virtual sensor.
+FLEET_INTERVAL = 10
+# the seconds to print the throughput and the latency to the standard error.
+FLEET_STATS_INTERVAL = 5
+# the share of the target rate of the reports to achieve in a step of the ramp, lower is the saturation.
+FLEET_SATURATION = 0.9
+
+######################
+#    Script Code     #
+######################
+LOGGER = None
+
+# the characteristics of the virtual sensors in turn, and the first values of them.
+FLEET_SENSOR_CHARACTERISTICS = (("CurrentTemperature", 20.0), ("CurrentRelativeHumidity", 50.0))
+
+
+class SimulatedFleet:
+    """SimulatedFleet class.
+
+    The SimulatedFleet class simulates the fleet of the virtual devices and sensors on the test mode.
+    - Answer a '_SET_' message of any device after a random delay around ``latency``, one by one per device,
+      with an '_ACK_' message for the id of it, or echo it without the id.
+    - Report the readings of the virtual sensors, each every ``interval`` seconds.
+    - Double the rate of the reports every ``ramp`` seconds until the writer does not keep up with it.
+    - Print the achieved throughput and the latency from receiving a '_SET_' to answering it to the standard error.
+    """
+
+    @traced
+    def __init__(self, logger, codec, sensors=0, latency=FLEET_LATENCY, interval=FLEET_INTERVAL, ramp=0,
+                 capture=None, startup_profile=None, seed=None):
+        """Create a simulated fleet.
+        Args:
+            logger: The logger.
+            codec: The JsonCodec of the messages.
+            sensors: The number of the virtual sensors.
+            latency: The seconds a virtual device takes to handle a '_SET_' message on average.
+            interval: The seconds between the reports of a virtual sensor.
+            ramp: The seconds of a step of the ramp of the reports, 0 reports at the fixed rate.
+            capture: The TrafficCapture to record the received lines, not recorded if None.
+            startup_profile: The StartupProfile to finish on reading the first message, not measured if None.
+            seed: The seed of the delays and the readings.
+        """
+        super().__init__()
+        global LOGGER
+        LOGGER = logger
+
+        self.__codec = codec
+        self.__writer = MessageWriter(logger, codec)
+        self.__capture = capture
+        self.__startup_profile = startup_profile
+        self.__latency = latency
+        self.__interval = interval
+        self.__ramp = ramp
+        self.__random = random.Random(seed)
+        self.__stopped = Event()
+
+        self.__sensors = []
+        for index in range(sensors):
+            characteristic, value = FLEET_SENSOR_CHARACTERISTICS[index % len(FLEET_SENSOR_CHARACTERISTICS)]
+            self.__sensors.append([f"Fleet Sensor {index + 1}", characteristic, value])
+        # the device name to the status of the device, and to the time the device finishes the last message.
+        self.__status = {}
+        self.__busy = {}
+        # the answers waiting for the delays of the devices, the tuples of the time, the order and the message.
+        self.__answers = []
+        self.__answers_condition = Condition()
+        self.__order = 0
+
+        # the counters of the current stats window and of the whole run.
+        self.__started = perf_counter()
+        self.__window_started = self.__started
+        self.__counters_lock = Lock()
+        self.__latencies = []
+        self.__total = {"received": 0, "answers": 0, "reports": 0}
+        self.__window = dict(self.__total)
+        self.__rate = len(self.__sensors) / interval if interval > 0 else 0.0
+        self.__saturated = None
+
+    @traced
+    def run(self):
+        self.__writer.start()
+        threads = [Thread(target=self.__answer, name="fleet answer"),
+                   Thread(target=self.__report, name="fleet report", daemon=True),
+                   Thread(target=self.__print_stats, name="fleet stats", daemon=True)]
+        for thread in threads:
+            thread.start()
+        LOGGER.info(f"Fleet: {len(self.__sensors)} sensors reporting {self.__rate:.1f} messages a second")
+
+        # wait for closing stdin
+        self.__loop()
+        self.__stopped.set()
+        # wait for answering the pending messages
+        with self.__answers_condition:
+            self.__answers_condition.notify_all()
+        threads[0].join()
+        # wait for writing the sent messages
+        self.__writer.stop()
+        print(f"fleet total: {self.__format(self.__total, perf_counter() - self.__started)}", file=sys.stderr)
+
+    def stats(self):
+        """Get the stats of the whole run.
+        """
+        elapsed = perf_counter() - self.__started
+        with self.__counters_lock:
+            stats = dict(self.__total)
+        stats["elapsed"] = elapsed
+        stats["report_rate"] = self.__rate
+        stats["saturated_rate"] = self.__saturated
+        return stats
+
+    @traced
+    def __loop(self):
+        for line in sys.stdin.buffer:
+            if self.__startup_profile is not None:
+                self.__startup_profile.finish("read the first message")
+                self.__startup_profile = None
+            LOGGER.info("received: %s", line.decode(errors="replace").strip())
+            # a bad line never stops the fleet, and is not recorded to replay.
+            try:
+                message = self.__codec.decode(line)
+            except ValueError as error:
+                LOGGER.error(f"Failed to decode the received line: {error!r}")
+                continue
+            if self.__capture is not None:
+                self.__capture.record(line)
+            if isinstance(message, dict):
+                self.__receive(message)
+
+    def __receive(self, message):
+        received = perf_counter()
+        self.__count("received")
+        method = message.get("method")
+        if method == "STATS":
+            stats = {"method": "STATS", "stats": self.stats()}
+            if "id" in message:
+                stats["id"] = message["id"]
+            self.__writer.write(stats)
+            return
+        if method == "GET":
+            name = message.get("name")
+            status = self.__status.get(name, {})
+            if "characteristic" in message:
+                status = {key: value for key, value in status.items() if key == message["characteristic"]}
+            self.__writer.write(AckMessage(name, message.get("id"), dict(status)))
+            return
+        if method != "SET":
+            return
+
+        # a virtual device handles the messages one by one in the arrival order.
+        name = message.get("name")
+        delay = self.__random.uniform(0.5, 1.5) * self.__latency if self.__latency > 0 else 0.0
+        finished = max(received, self.__busy.get(name, received)) + delay
+        self.__busy[name] = finished
+        with self.__answers_condition:
+            self.__order += 1
+            heapq.heappush(self.__answers, (finished, self.__order, received, message))
+            self.__answers_condition.notify()
+
+    def __answer(self):
+        while True:
+            with self.__answers_condition:
+                while True:
+                    if self.__answers:
+                        wait = self.__answers[0][0] - perf_counter()
+                        if wait <= 0:
+                            break
+                    elif self.__stopped.is_set():
+                        return
+                    else:
+                        wait = None
+                    self.__answers_condition.wait(wait)
+                _, _, received, message = heapq.heappop(self.__answers)
+
+            name = message.get("name")
+            status = dict(message.get("status") or self.__status.get(name, {}))
+            status[message.get("characteristic")] = message.get("value")
+            self.__status[name] = status
+            # answer a request with an ACK message, and echo a SET message without the id as the test mode does.
+            if "id" in message:
+                self.__writer.write(AckMessage(name, message["id"], dict(status)))
+            else:
+                self.__writer.write(message)
+            self.__count("answers", perf_counter() - received)
+
+    def __report(self):
+        if not self.__sensors or self.__rate <= 0:
+            return
+        step_started = perf_counter()
+        step_reports = 0
+        reports = 0
+        while not self.__stopped.is_set():
+            # the reports are spaced evenly, and the late ones are written at once to catch up.
+            due = step_started + step_reports / self.__rate
+            wait = due - perf_counter()
+            if wait > 0:
+                sleep(wait)
+            sensor = self.__sensors[reports % len(self.__sensors)]
+            sensor[2] = round(sensor[2] + self.__random.uniform(-0.5, 0.5), 1)
+            self.__writer.write(SetMessage(sensor[0], sensor[1], sensor[2]))
+            self.__status.setdefault(sensor[0], {})[sensor[1]] = sensor[2]
+            self.__count("reports")
+            reports += 1
+            step_reports += 1
+
+            elapsed = perf_counter() - step_started
+            if self.__ramp <= 0 or self.__saturated is not None or elapsed < self.__ramp:
+                continue
+            achieved = step_reports / elapsed
+            if achieved < self.__rate * FLEET_SATURATION:
+                # hold the last rate the writer kept up with.
+                self.__saturated = achieved
+                self.__rate /= 2
+                LOGGER.info(f"Fleet: saturated at {achieved:.1f} reports a second")
+                print(f"fleet saturated: {achieved:.1f} reports a second", file=sys.stderr)
+            else:
+                self.__rate *= 2
+            step_started = perf_counter()
+            step_reports = 0
+
+    def __count(self, counter, latency=None):
+        with self.__counters_lock:
+            self.__total[counter] += 1
+            self.__window[counter] += 1
+            if latency is not None:
+                self.__latencies.append(latency)
+
+    def __print_stats(self):
+        while not self.__stopped.wait(FLEET_STATS_INTERVAL):
+            now = perf_counter()
+            with self.__counters_lock:
+                window, self.__window = self.__window, {key: 0 for key in self.__total}
+                latencies, self.__latencies = self.__latencies, []
+            elapsed, self.__window_started = now - self.__window_started, now
+            line = self.__format(window, elapsed, latencies)
+            LOGGER.info(f"Fleet: {line}")
+            print(f"fleet: {line}", file=sys.stderr)
+
+    def __format(self, counters, elapsed, latencies=None):
+        rates = " ".join(f"{key} {value / elapsed:.1f}/s" for key, value in counters.items())
+        line = f"{rates}, target reports {self.__rate:.1f}/s"
+        if latencies:
+            latencies = sorted(latencies)
+            p50 = latencies[(len(latencies) - 1) // 2]
+            p99 = latencies[min(len(latencies) - 1, len(latencies) * 99 // 100)]
+            line += f", answer latency p50 {p50 * 1000:.1f} ms p99 {p99 * 1000:.1f} ms"
+        return line
+
+
+if __name__ == "__main__":
+    print("SimulatedFleet is an Import Module.")
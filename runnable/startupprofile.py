@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+
+# Copyright (c) 2023 Patineboot. All rights reserved.
+# StartupProfile is licensed under CC BY-NC-ND 4.0.
+
+# Attribution-NonCommercial-NoDerivatives 4.0 International
+
+# Under the following terms:
+# Attribution — You must give appropriate credit, provide a
+# link to the license, and indicate if changes were made. You
+# may do so in any reasonable manner, but not in any way that
+# suggests the licensor endorses you or your use.
+# NonCommercial — You may not use the material for
+# commercial purposes.
+# NoDerivatives — If you remix, transform, or build upon the
+# material, you may not distribute the modified material.
+# No additional restrictions — You may not apply legal terms
+# or technological measures that legally restrict others from
+# doing anything the license permits.
+
+# Notices:
+# You do not have to comply with the license for elements of
+# the material in the public domain or where your use is
+# permitted by an applicable exception or limitation.
+
+# No warranties are given. The license may not give you all of
+# the permissions necessary for your intended use. For
+# example, other rights such as publicity, privacy, or moral
+# rights may limit how you use the material.
+
+import sys
+from time import perf_counter
+from threading import Lock
+
+
+class StartupProfile:
+    """StartupProfile class.
+
+    The StartupProfile class measures the phases of the startup.
+    - Mark the end of a phase with its name, the phase takes the time since the previous mark.
+    - Print the phases once to the standard error, the standard output is of the messages.
+    """
+
+    def __init__(self, started, interpreter):
+        """Create a startup profile.
+        Args:
+            started: The perf_counter time of starting the profile.
+            interpreter: The CPU seconds of the interpreter before starting the profile.
+        """
+        super().__init__()
+
+        self.__started = started
+        self.__interpreter = interpreter
+        self.__marks = []
+        self.__lock = Lock()
+        self.__printed = False
+
+    def mark(self, name):
+        """Mark the end of the phase ``name``.
+        """
+        with self.__lock:
+            self.__marks.append((name, perf_counter()))
+
+    def finish(self, name, stream=None):
+        """Mark the end of the last phase ``name`` and print the phases if not printed yet.
+        Args:
+            name: The name of the last phase.
+            stream: The stream to print the phases, the standard error if None.
+        """
+        with self.__lock:
+            if self.__printed:
+                return
+            self.__printed = True
+            self.__marks.append((name, perf_counter()))
+            marks = list(self.__marks)
+
+        stream = stream if stream is not None else sys.stderr
+        lines = ["startup profile:   total    phase",
+                 f"{'':15}{self.__interpreter * 1000:8.1f} ms           interpreter (CPU time)"]
+        previous = self.__started
+        for phase, time in marks:
+            lines.append(f"{'':15}{(time - self.__started) * 1000:8.1f} ms {(time - previous) * 1000:6.1f} ms  {phase}")
+            previous = time
+        stream.write("\n".join(lines) + "\n")
+        stream.flush()
+
+
+if __name__ == "__main__":
+    print("StartupProfile is an Import Module.")
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+
+# Copyright (c) 2023 Patineboot. All rights reserved.
+# StateCache is licensed under CC BY-NC-ND 4.0.
+
+# Attribution-NonCommercial-NoDerivatives 4.0 International
+
+# Under the following terms:
+# Attribution — You must give appropriate credit, provide a
+# link to the license, and indicate if changes were made. You
+# may do so in any reasonable manner, but not in any way that
+# suggests the licensor endorses you or your use.
+# NonCommercial — You may not use the material for
+# commercial purposes.
+# NoDerivatives — If you remix, transform, or build upon the
+# material, you may not distribute the modified material.
+# No additional restrictions — You may not apply legal terms
+# or technological measures that legally restrict others from
+# doing anything the license permits.
+
+# Notices:
+# You do not have to comply with the license for elements of
+# the material in the public domain or where your use is
+# permitted by an applicable exception or limitation.
+
+# No warranties are given. The license may not give you all of
+# the permissions necessary for your intended use. For
+# example, other rights such as publicity, privacy, or moral
+# rights may limit how you use the material.
+
+from time import monotonic
+from threading import Lock
+
+from multilogger import traced
+
+######################
+#    Script Code     #
+######################
+LOGGER = None
+
+
+class StateCache:
+    """StateCache class.
+
+    The StateCache class keeps the current values of the characteristics of the accessories in memory.
+    - Keep each value with the time it was updated, so a reader knows the age of it.
+    - Answer a reader from memory only, never from the devices or the sensors.
+    """
+
+    @traced
+    def __init__(self, logger):
+        """Create an empty state cache.
+        Args:
+            logger: The logger.
+        """
+        super().__init__()
+        global LOGGER
+        LOGGER = logger
+
+        self.__lock = Lock()
+        # the accessory name to the characteristic name to the tuple of the value and the time.
+        self.__values = {}
+
+    def update(self, name, values, updated=None):
+        """Update the characteristics of the accessory ``name`` with the dictionary ``values``.
+        Args:
+            name: The accessory name.
+            values: The characteristic names to the values.
+            updated: The monotonic time of the values, now if None, -inf as unknown.
+        """
+        if updated is None:
+            updated = monotonic()
+        with self.__lock:
+            characteristics = self.__values.setdefault(name, {})
+            for characteristic, value in values.items():
+                characteristics[characteristic] = (value, updated)
+
+    def get(self, name, characteristic=None):
+        """Get the values of the accessory ``name``.
+        Args:
+            name: The accessory name.
+            characteristic: The characteristic name, all the characteristics if None.
+        Returns:
+            The tuple of the dictionary of the characteristic names to the values
+            and the seconds of the oldest value, None as the age of no values.
+        """
+        with self.__lock:
+            characteristics = self.__values.get(name, {})
+            if characteristic is not None:
+                characteristics = {characteristic: characteristics[characteristic]} \
+                    if characteristic in characteristics else {}
+            else:
+                characteristics = dict(characteristics)
+
+        if not characteristics:
+            return {}, None
+        oldest = min(updated for _, updated in characteristics.values())
+        values = {characteristic: value for characteristic, (value, _) in characteristics.items()}
+        return values, monotonic() - oldest
+
+
+if __name__ == "__main__":
+    print("StateCache is an Import Module.")
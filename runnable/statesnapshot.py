@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+
+# Copyright (c) 2023 Patineboot. All rights reserved.
+# StateSnapshot is licensed under CC BY-NC-ND 4.0.
+
+# Attribution-NonCommercial-NoDerivatives 4.0 International
+
+# Under the following terms:
+# Attribution — You must give appropriate credit, provide a
+# link to the license, and indicate if changes were made. You
+# may do so in any reasonable manner, but not in any way that
+# suggests the licensor endorses you or your use.
+# NonCommercial — You may not use the material for
+# commercial purposes.
+# NoDerivatives — If you remix, transform, or build upon the
+# material, you may not distribute the modified material.
+# No additional restrictions — You may not apply legal terms
+# or technological measures that legally restrict others from
+# doing anything the license permits.
+
+# Notices:
+# You do not have to comply with the license for elements of
+# the material in the public domain or where your use is
+# permitted by an applicable exception or limitation.
+
+# No warranties are given. The license may not give you all of
+# the permissions necessary for your intended use. For
+# example, other rights such as publicity, privacy, or moral
+# rights may limit how you use the material.
+
+import os
+import json
+from threading import Thread
+from threading import Event
+from threading import Lock
+
+from multilogger import traced
+
+######################
+#      Configure     #
+######################
+# the seconds between the writes of the snapshot file at least.
+SNAPSHOT_INTERVAL = 5
+
+######################
+#    Script Code     #
+######################
+LOGGER = None
+
+
+class StateSnapshot:
+    """StateSnapshot class.
+
+    The StateSnapshot class keeps the last state of the devices and the sensors in a snapshot file.
+    - Update the state in memory, the writer thread writes the file, so the updater never waits for the disk.
+    - Write the file at most once every ``interval`` seconds, and replace it at once with a new file.
+    - Load the file of the previous run at startup, an empty state if it is missing or broken.
+    """
+
+    @traced
+    def __init__(self, logger, path, interval=SNAPSHOT_INTERVAL):
+        """Create a snapshot of the file ``path``.
+        Args:
+            logger: The logger.
+            path: The path of the snapshot file.
+            interval: The seconds between the writes of the snapshot file at least.
+        """
+        super().__init__()
+        global LOGGER
+        LOGGER = logger
+
+        self.__path = path
+        self.__interval = interval
+        self.__lock = Lock()
+        self.__state = self.__load()
+        self.__dirty = Event()
+        self.__stopped = Event()
+        self.__thread = None
+
+    def get(self, section):
+        """Get a copy of the state of ``section``.
+        Returns:
+            The dictionary of the keys to the dictionaries of the values in the section.
+        """
+        with self.__lock:
+            return {key: dict(values) for key, values in self.__state.get(section, {}).items()}
+
+    def update(self, section, key, values):
+        """Update the values of ``key`` of ``section`` with the dictionary ``values`` and write them later.
+        """
+        with self.__lock:
+            self.__state.setdefault(section, {}).setdefault(key, {}).update(values)
+        self.__dirty.set()
+
+    def start(self):
+        """Start the thread to write the snapshot file.
+        """
+        self.__stopped.clear()
+        thread = Thread(target=self.__run, daemon=True)
+        thread.start()
+        self.__thread = thread
+        return thread
+
+    def stop(self):
+        """Stop the thread after writing the last state.
+        """
+        if self.__thread is None:
+            return
+        self.__stopped.set()
+        self.__dirty.set()
+        self.__thread.join()
+        self.__thread = None
+
+    def __load(self):
+        try:
+            with open(self.__path, "r") as file:
+                state = json.load(file)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as error:
+            LOGGER.warning(f"Not load the snapshot file: {error}")
+            return {}
+        if not isinstance(state, dict):
+            LOGGER.warning(f"Not load the snapshot file: {self.__path} is not an object")
+            return {}
+
+        LOGGER.info(f"Snapshot: loaded {self.__path}")
+        return state
+
+    @traced
+    def __run(self):
+        while not self.__stopped.is_set():
+            self.__dirty.wait()
+            self.__dirty.clear()
+            self.__write()
+            # coalesce the updates within the interval into the next write.
+            self.__stopped.wait(self.__interval)
+
+        # write the updates after the last write.
+        if self.__dirty.is_set():
+            self.__write()
+
+    def __write(self):
+        with self.__lock:
+            content = json.dumps(self.__state, indent=4, sort_keys=True)
+
+        temporary = self.__path + ".tmp"
+        try:
+            with open(temporary, "w") as file:
+                file.write(content)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temporary, self.__path)
+        except OSError as error:
+            LOGGER.warning(f"Not write the snapshot file: {error}")
+
+
+if __name__ == "__main__":
+    print("StateSnapshot is an Import Module.")
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+
+# Copyright (c) 2023 Patineboot. All rights reserved.
+# Supervisor is licensed under CC BY-NC-ND 4.0.
+
+# Attribution-NonCommercial-NoDerivatives 4.0 International
+
+# Under the following terms:
+# Attribution — You must give appropriate credit, provide a
+# link to the license, and indicate if changes were made. You
+# may do so in any reasonable manner, but not in any way that
+# suggests the licensor endorses you or your use.
+# NonCommercial — You may not use the material for
+# commercial purposes.
+# NoDerivatives — If you remix, transform, or build upon the
+# material, you may not distribute the modified material.
+# No additional restrictions — You may not apply legal terms
+# or technological measures that legally restrict others from
+# doing anything the license permits.
+
+# Notices:
+# You do not have to comply with the license for elements of
+# the material in the public domain or where your use is
+# permitted by an applicable exception or limitation.
+
+# No warranties are given. The license may not give you all of
+# the permissions necessary for your intended use. For
+# example, other rights such as publicity, privacy, or moral
+# rights may limit how you use the material.
+
+from time import perf_counter
+from threading import Thread
+from threading import Event
+
+from multilogger import traced
+
+######################
+#      Configure     #
+######################
+# the seconds to wait before restarting a failed stage first.
+SUPERVISOR_BACKOFF = 1
+# the seconds to wait before restarting a stage failing repeatedly at most.
+SUPERVISOR_MAX_BACKOFF = 60
+# the seconds a stage runs to be restarted without waiting longer again.
+SUPERVISOR_STABLE = 60
+
+######################
+#    Script Code     #
+######################
+LOGGER = None
+
+
+class Supervisor:
+    """Supervisor class.
+
+    The Supervisor class restarts the failed stages in place instead of exiting the whole process.
+    - Run a stage on a thread or as a task on the event loop, and restart it after an exception.
+    - Double the wait before restarting a stage failing again soon, up to ``max_backoff`` seconds.
+    - Finish a stage returning normally without restarting it.
+    """
+
+    @traced
+    def __init__(self, logger, metrics=None, backoff=SUPERVISOR_BACKOFF, max_backoff=SUPERVISOR_MAX_BACKOFF):
+        """Create a supervisor.
+        Args:
+            logger: The logger.
+            metrics: The RunnableMetrics to count the restarts of the stages.
+            backoff: The seconds to wait before restarting a failed stage first.
+            max_backoff: The seconds to wait before restarting a stage at most.
+        """
+        super().__init__()
+        global LOGGER
+        LOGGER = logger
+
+        self.__metrics = metrics
+        self.__backoff = backoff
+        self.__max_backoff = max_backoff
+        self.__stopped = Event()
+
+    def start(self, name, function):
+        """Run ``function`` on a supervised thread of the stage ``name``.
+        Returns:
+            The thread finishing when ``function`` returns or the supervisor is stopped.
+        """
+        thread = Thread(target=self.__supervise, args=(name, function))
+        thread.start()
+        return thread
+
+    def stop(self):
+        """Not restart the failed stages any more.
+        """
+        self.__stopped.set()
+
+    async def run_async(self, name, function):
+        """Run the coroutine function ``function`` of the stage ``name`` on the event loop until it returns.
+        """
+        import asyncio
+
+        delay = self.__backoff
+        while not self.__stopped.is_set():
+            started = perf_counter()
+            try:
+                return await function()
+            except asyncio.CancelledError:
+                # Python 3.7 derives CancelledError from Exception.
+                raise
+            except Exception as error:
+                delay = self.__fail(name, error, started, delay)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.__max_backoff)
+
+    @traced
+    def __supervise(self, name, function):
+        delay = self.__backoff
+        while not self.__stopped.is_set():
+            started = perf_counter()
+            try:
+                return function()
+            except Exception as error:
+                delay = self.__fail(name, error, started, delay)
+            if self.__stopped.wait(delay):
+                break
+            delay = min(delay * 2, self.__max_backoff)
+
+    def __fail(self, name, error, started, delay):
+        # a stage ran stably before the failure restarts without the longer wait.
+        if perf_counter() - started >= SUPERVISOR_STABLE:
+            delay = self.__backoff
+        LOGGER.error(f"The stage {name} failed, restart it in {delay} seconds: {error!r}")
+        if self.__metrics is not None:
+            self.__metrics.increment("stage_restarts")
+        return delay
+
+
+if __name__ == "__main__":
+    print("Supervisor is an Import Module.")
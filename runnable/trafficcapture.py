@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+
+# Copyright (c) 2023 Patineboot. All rights reserved.
+# TrafficCapture is licensed under CC BY-NC-ND 4.0.
+
+# Attribution-NonCommercial-NoDerivatives 4.0 International
+
+# Under the following terms:
+# Attribution — You must give appropriate credit, provide a
+# link to the license, and indicate if changes were made. You
+# may do so in any reasonable manner, but not in any way that
+# suggests the licensor endorses you or your use.
+# NonCommercial — You may not use the material for
+# commercial purposes.
+# NoDerivatives — If you remix, transform, or build upon the
+# material, you may not distribute the modified material.
+# No additional restrictions — You may not apply legal terms
+# or technological measures that legally restrict others from
+# doing anything the license permits.
+
+# Notices:
+# You do not have to comply with the license for elements of
+# the material in the public domain or where your use is
+# permitted by an applicable exception or limitation.
+
+# No warranties are given. The license may not give you all of
+# the permissions necessary for your intended use. For
+# example, other rights such as publicity, privacy, or moral
+# rights may limit how you use the material.
+
+from time import perf_counter
+
+from multilogger import traced
+
+######################
+#    Script Code     #
+######################
+LOGGER = None
+
+
+class TrafficCapture:
+    """TrafficCapture class.
+
+    The TrafficCapture class records the received lines into a replayable JSONL file.
+    - Record each line as ``{"at": seconds, "message": message}``,
+      the seconds since the first line.
+    - Copy the bytes of the line without decoding it, so the capture does not slow the receiver.
+    - Record the lines the receiver decoded only, a line of invalid JSON would break the JSONL file.
+    """
+
+    @traced
+    def __init__(self, logger, path):
+        """Create a capture into the file ``path``.
+        Args:
+            logger: The logger.
+            path: The JSONL file to record the received lines, truncated on creating.
+        """
+        super().__init__()
+        global LOGGER
+        LOGGER = logger
+
+        self.__path = path
+        self.__file = open(path, "wb")
+        self.__started = None
+        LOGGER.info(f"Capture: record the received lines to {path}")
+
+    def record(self, line):
+        """Record the received ``line`` of a JSON message with the seconds since the first line.
+        """
+        line = line.strip()
+        if not line:
+            return
+
+        now = perf_counter()
+        if self.__started is None:
+            self.__started = now
+        self.__file.write(b'{"at": %.6f, "message": %s}\n' % (now - self.__started, line))
+
+    def close(self):
+        """Write the recorded lines and close the file.
+        """
+        if self.__file.closed:
+            return
+        self.__file.close()
+        LOGGER.info(f"Capture: closed {self.__path}")
+
+
+if __name__ == "__main__":
+    print("TrafficCapture is an Import Module.")
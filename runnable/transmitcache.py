@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+
+# Copyright (c) 2023 Patineboot. All rights reserved.
+# TransmitCache is licensed under CC BY-NC-ND 4.0.
+
+# Attribution-NonCommercial-NoDerivatives 4.0 International
+
+# Under the following terms:
+# Attribution — You must give appropriate credit, provide a
+# link to the license, and indicate if changes were made. You
+# may do so in any reasonable manner, but not in any way that
+# suggests the licensor endorses you or your use.
+# NonCommercial — You may not use the material for
+# commercial purposes.
+# NoDerivatives — If you remix, transform, or build upon the
+# material, you may not distribute the modified material.
+# No additional restrictions — You may not apply legal terms
+# or technological measures that legally restrict others from
+# doing anything the license permits.
+
+# Notices:
+# You do not have to comply with the license for elements of
+# the material in the public domain or where your use is
+# permitted by an applicable exception or limitation.
+
+# No warranties are given. The license may not give you all of
+# the permissions necessary for your intended use. For
+# example, other rights such as publicity, privacy, or moral
+# rights may limit how you use the material.
+
+from time import monotonic
+from threading import Lock
+
+from multilogger import traced
+
+######################
+#    Script Code     #
+######################
+LOGGER = None
+
+
+class TransmitCache:
+    """TransmitCache class.
+
+    The TransmitCache class remembers the last infrared code sent to each device.
+    - Answer the same infrared code within ``ttl`` seconds from the cache without sending it again.
+    - Send every infrared code if ``ttl`` is 0 or less.
+    """
+
+    @traced
+    def __init__(self, logger, ttl):
+        """Create a transmit cache.
+        Args:
+            logger: The logger.
+            ttl: The seconds to trust the last infrared code sent to a device.
+        """
+        super().__init__()
+        global LOGGER
+        LOGGER = logger
+
+        self.__ttl = ttl
+        # the device name to the tuple of the infrared code, the state, and the sent time.
+        self.__entries = {}
+        self.__lock = Lock()
+
+    def lookup(self, key, infrared_code):
+        """Look up the device ``key`` with ``infrared_code`` in the cache.
+        Returns:
+            The state stored with the infrared code, None if the device needs ``infrared_code``.
+        """
+        if self.__ttl <= 0:
+            return None
+
+        with self.__lock:
+            entry = self.__entries.get(key)
+        if entry is None:
+            return None
+
+        cached_code, state, sent_time = entry
+        if cached_code != infrared_code or monotonic() - sent_time > self.__ttl:
+            return None
+        return state
+
+    def store(self, key, infrared_code, state, age=0):
+        """Store ``infrared_code`` and ``state`` sent to the device ``key`` ``age`` seconds ago.
+        """
+        with self.__lock:
+            self.__entries[key] = (infrared_code, state, monotonic() - age)
+
+    def invalidate(self, key=None):
+        """Forget the device ``key``, or all the devices if None, to send the next code by force.
+        """
+        with self.__lock:
+            if key is None:
+                self.__entries.clear()
+            else:
+                self.__entries.pop(key, None)
+
+
+if __name__ == "__main__":
+    print("TransmitCache is an Import Module.")
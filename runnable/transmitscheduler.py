@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+
+# Copyright (c) 2023 Patineboot. All rights reserved.
+# TransmitScheduler is licensed under CC BY-NC-ND 4.0.
+
+# Attribution-NonCommercial-NoDerivatives 4.0 International
+
+# Under the following terms:
+# Attribution — You must give appropriate credit, provide a
+# link to the license, and indicate if changes were made. You
+# may do so in any reasonable manner, but not in any way that
+# suggests the licensor endorses you or your use.
+# NonCommercial — You may not use the material for
+# commercial purposes.
+# NoDerivatives — If you remix, transform, or build upon the
+# material, you may not distribute the modified material.
+# No additional restrictions — You may not apply legal terms
+# or technological measures that legally restrict others from
+# doing anything the license permits.
+
+# Notices:
+# You do not have to comply with the license for elements of
+# the material in the public domain or where your use is
+# permitted by an applicable exception or limitation.
+
+# No warranties are given. The license may not give you all of
+# the permissions necessary for your intended use. For
+# example, other rights such as publicity, privacy, or moral
+# rights may limit how you use the material.
+
+from threading import Thread
+
+from devicemailbox import DeviceMailbox
+from multilogger import traced
+
+######################
+#    Script Code     #
+######################
+LOGGER = None
+
+
+class TransmitScheduler:
+    """TransmitScheduler class.
+
+    The TransmitScheduler class hands the messages to a worker per infrared transmitter.
+    - Queue the messages of the devices of a transmitter in the DeviceMailbox of the transmitter.
+    - Handle the messages of a transmitter one by one in the arrival order,
+      and the messages of different transmitters concurrently.
+    """
+
+    @traced
+    def __init__(self, logger, transmitters, coalesce=None, group=None, prioritize=None):
+        """Create a scheduler.
+        Args:
+            logger: The logger.
+            transmitters: The names of the infrared transmitters.
+            coalesce: The function to merge a pending message into a newer message of a device,
+                see DeviceMailbox.
+            group: The function to get the group of a message taken together, see DeviceMailbox.
+            prioritize: The function to get the priority of a merged message, see DeviceMailbox.
+        """
+        super().__init__()
+        global LOGGER
+        LOGGER = logger
+
+        self.__mailboxes = {transmitter: DeviceMailbox(logger, coalesce, group, prioritize)
+                            for transmitter in transmitters}
+        self.__threads = []
+        # the events to wake the workers up on the asyncio mode.
+        self.__wakeups = {}
+
+    def put(self, transmitter, key, message, priority=0):
+        """Put ``message`` for the device ``key`` to the worker of ``transmitter``.
+        The worker takes a message of a smaller ``priority`` first.
+        Returns:
+            True if the message replaced a pending message.
+        """
+        coalesced = self.__mailboxes[transmitter].put(key, message, priority)
+        wakeup = self.__wakeups.get(transmitter)
+        if wakeup is not None:
+            wakeup.set()
+        return coalesced
+
+    def start(self, handle):
+        """Start a worker thread per transmitter.
+        Args:
+            handle: The function to handle a message, ``handle(transmitter, key, message)``.
+        """
+        for transmitter, mailbox in self.__mailboxes.items():
+            thread = Thread(target=self.__work, args=(transmitter, mailbox, handle))
+            thread.start()
+            self.__threads.append(thread)
+
+    def join(self):
+        """Wait for the worker threads to handle the pending messages after ``close``.
+        """
+        for thread in self.__threads:
+            thread.join()
+        self.__threads = []
+
+    async def run_async(self, handle):
+        """Run a worker task per transmitter on the event loop until the scheduler is closed and drained.
+        Args:
+            handle: The coroutine function to handle a message, ``handle(transmitter, key, message)``.
+        """
+        import asyncio
+
+        self.__wakeups = {transmitter: asyncio.Event() for transmitter in self.__mailboxes}
+        try:
+            await asyncio.gather(*(self.__work_async(transmitter, mailbox, handle)
+                                   for transmitter, mailbox in self.__mailboxes.items()))
+        finally:
+            self.__wakeups = {}
+
+    def close(self):
+        """Close the mailboxes, the workers exit after handling the pending messages.
+        """
+        for mailbox in self.__mailboxes.values():
+            mailbox.close()
+        for wakeup in self.__wakeups.values():
+            wakeup.set()
+
+    def __len__(self):
+        return sum(len(mailbox) for mailbox in self.__mailboxes.values())
+
+    @traced
+    def __work(self, transmitter, mailbox, handle):
+        while True:
+            taken = mailbox.get()
+            if taken is None:
+                break
+            key, message = taken
+            try:
+                handle(transmitter, key, message)
+            finally:
+                mailbox.done(key)
+
+    @traced
+    async def __work_async(self, transmitter, mailbox, handle):
+        wakeup = self.__wakeups[transmitter]
+        while not mailbox.is_drained():
+            taken = mailbox.get_nowait()
+            if taken is None:
+                wakeup.clear()
+                await wakeup.wait()
+                continue
+            key, message = taken
+            try:
+                await handle(transmitter, key, message)
+            finally:
+                mailbox.done(key)
+
+
+if __name__ == "__main__":
+    print("TransmitScheduler is an Import Module.")